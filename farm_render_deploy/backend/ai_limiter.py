@@ -0,0 +1,101 @@
+"""
+Обмеження одночасних запитів до AI (Gemini)
+
+Кількість запитів до upstream обмежена семафором, решта чекають у черзі
+обмеженої довжини. Кожен запит має дедлайн, що покриває і очікування
+в черзі, і сам виклик моделі.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+
+AI_MAX_CONCURRENT = int(os.getenv("AI_MAX_CONCURRENT", "4"))  # Одночасних запитів до моделі
+AI_MAX_WAITING = int(os.getenv("AI_MAX_WAITING", "16"))  # Довжина черги очікування
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "30"))  # Дедлайн запиту, секунд
+AI_STREAM_TIMEOUT = float(os.getenv("AI_STREAM_TIMEOUT", "120"))  # Дедлайн потокової відповіді, секунд
+AI_LATENCY_BUDGET = float(os.getenv("AI_LATENCY_BUDGET", "45"))  # Бюджет усіх викликів AI однієї відповіді, секунд
+
+
+class UpstreamLimiter:
+    """Семафор з обмеженою чергою та дедлайнами для викликів AI"""
+
+    def __init__(self, max_concurrent: int = AI_MAX_CONCURRENT, max_waiting: int = AI_MAX_WAITING):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._waiting = 0
+        self._in_flight = 0
+
+    @property
+    def stats(self) -> dict:
+        """Поточне завантаження"""
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+        }
+
+    @asynccontextmanager
+    async def slot(self, deadline: float):
+        """
+        Зайняти місце для виклику upstream
+
+        Args:
+            deadline: момент (loop.time()), до якого має завершитись запит
+        """
+        loop = asyncio.get_running_loop()
+
+        if not self._semaphore.locked():
+            # Вільне місце - захоплюємо без очікування
+            await self._semaphore.acquire()
+        else:
+            if self._waiting >= self.max_waiting:
+                raise HTTPException(
+                    status_code=503,
+                    detail="AI сервіс перевантажений. Спробуйте пізніше"
+                )
+
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=503,
+                    detail="AI сервіс перевантажений: час очікування в черзі вичерпано"
+                )
+            finally:
+                self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    async def run(self, make_call, timeout: float = AI_REQUEST_TIMEOUT):
+        """
+        Виконати асинхронний виклик upstream з урахуванням ліміту та дедлайну
+
+        Args:
+            make_call: функція без аргументів, що повертає корутину
+            timeout: загальний дедлайн запиту в секундах
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        async with self.slot(deadline):
+            try:
+                return await asyncio.wait_for(make_call(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=504,
+                    detail=f"AI не відповів за {timeout:.0f} с"
+                )
+
+
+# Глобальний обмежувач для використання в API
+ai_limiter = UpstreamLimiter()
@@ -0,0 +1,257 @@
+"""
+Інструменти (function calling) для AI асистента
+
+Замість повного дампу даних у промпті модель викликає невеликі інструменти,
+які працюють локально на основі ExcelDataReader та бази даних. Результати
+кешуються з урахуванням версії даних.
+"""
+
+import json
+import math
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+
+from database.models import WeeklyRecord
+from backend.chat_cache import TTLCache
+
+CHAT_USE_TOOLS = os.getenv("CHAT_USE_TOOLS", "0") == "1"  # Інструменти за замовчуванням
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "3"))  # Максимум раундів викликів інструментів
+MAX_TOOL_RESULT_CHARS = 8000  # Обмеження розміру результату інструменту
+MAX_WEEKLY_RECORDS = 52  # Максимум тижневих записів за один виклик
+
+# Опис інструментів у форматі JSON Schema (не залежить від провайдера AI)
+TOOL_DECLARATIONS = [
+    {
+        "name": "search_sow",
+        "description": "Історія конкретної свиноматки з обліку свиноматок (осіменіння, тести на 28 день)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "sow_number": {"type": "string", "description": "Номер свиноматки"},
+            },
+            "required": ["sow_number"],
+        },
+    },
+    {
+        "name": "get_weekly_records",
+        "description": "Тижневі записи з бази даних (опороси, живі та мертві поросята, виживаність) за період",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start_date": {"type": "string", "description": "Початок періоду, YYYY-MM-DD"},
+                "end_date": {"type": "string", "description": "Кінець періоду, YYYY-MM-DD"},
+            },
+            "required": ["start_date", "end_date"],
+        },
+    },
+    {
+        "name": "get_statistics_summary",
+        "description": "Зведена статистика з Excel файлів: осіменіння, % перегулу, свиноматки, тести",
+        "parameters": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "search_records",
+        "description": "Пошук рядків Excel, тижневих записів і свиноматок з БД (разом з примітками) за текстом",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Текст пошуку, наприклад 'діарея поросят' або номер свиноматки"},
+            },
+            "required": ["query"],
+        },
+    },
+    {
+        "name": "get_planned_farrowings",
+        "description": "Планові опороси (114 днів після осіменіння) та потреба корму, за потреби за період",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start_date": {"type": "string", "description": "Початок періоду, YYYY-MM-DD (необов'язково)"},
+                "end_date": {"type": "string", "description": "Кінець періоду, YYYY-MM-DD (необов'язково)"},
+            },
+        },
+    },
+]
+
+# Кеш результатів інструментів: (назва, аргументи, версія даних) -> результат
+tool_cache = TTLCache(max_size=128)
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    """Дата з рядка YYYY-MM-DD або DD.MM.YYYY"""
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Невірна дата: {value}")
+
+
+def _json_safe(value: Any) -> Any:
+    """Перетворення результату в JSON-сумісні типи (NaN -> None, дати -> рядки)"""
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy скаляри
+        return _json_safe(value.item())
+    return str(value)
+
+
+def _limit_result(result: Any) -> Any:
+    """Обрізання завеликих результатів, щоб не роздувати промпт"""
+    text = json.dumps(result, ensure_ascii=False)
+    if len(text) <= MAX_TOOL_RESULT_CHARS:
+        return result
+    return {"truncated": True, "text": text[:MAX_TOOL_RESULT_CHARS]}
+
+
+def tool_search_sow(db: Session, sow_number: str) -> Any:
+    """Пошук свиноматки в Excel"""
+    from backend.excel_reader import excel_reader
+
+    result = excel_reader.search_sow(str(sow_number))
+    return result or {"found": False, "sow_number": sow_number}
+
+
+def tool_get_weekly_records(db: Session, start_date: str, end_date: str) -> Any:
+    """Тижневі записи з БД за період"""
+    start, end = _parse_date(start_date), _parse_date(end_date)
+    records = db.query(WeeklyRecord).filter(
+        WeeklyRecord.week_start_date >= start,
+        WeeklyRecord.week_start_date <= end
+    ).order_by(WeeklyRecord.week_start_date).limit(MAX_WEEKLY_RECORDS).all()
+    return {"records": [record.to_dict() for record in records]}
+
+
+def tool_get_statistics_summary(db: Session) -> Any:
+    """Зведена статистика з Excel (без сирих рядків аркушів)"""
+    from backend.excel_reader import excel_reader
+
+    summary = excel_reader.get_statistics_summary()
+    for key in ("farm_data", "sows_data"):
+        data = summary.get(key) or {}
+        for sheet in (data.get("sheets") or {}).values():
+            sheet.pop("data", None)
+        data.pop("recent_records", None)
+        data.pop("planned_farrowings", None)
+    return summary
+
+
+def tool_search_records(db: Session, query: str) -> Any:
+    """Найрелевантніші рядки з локального пошукового індексу"""
+    from backend.retrieval_index import retrieval_index
+
+    return {"results": retrieval_index.search(db, str(query))}
+
+
+def tool_get_planned_farrowings(db: Session, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Any:
+    """Планові опороси, за потреби відфільтровані за датою опоросу"""
+    from backend.excel_reader import excel_reader
+
+    sows_data = excel_reader.read_sows_data() or {}
+    planned = sows_data.get("planned_farrowings", [])
+    start, end = _parse_date(start_date), _parse_date(end_date)
+
+    if start or end:
+        filtered = []
+        for plan in planned:
+            farrowing = _parse_date(plan["planned_farrowing"])
+            if (not start or farrowing >= start) and (not end or farrowing <= end):
+                filtered.append(plan)
+        planned = filtered
+
+    return {
+        "planned_farrowings": planned,
+        "total_feed_kg": sum(plan.get("feed_needed_kg", 0) for plan in planned),
+    }
+
+
+TOOL_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "search_sow": tool_search_sow,
+    "get_weekly_records": tool_get_weekly_records,
+    "get_statistics_summary": tool_get_statistics_summary,
+    "search_records": tool_search_records,
+    "get_planned_farrowings": tool_get_planned_farrowings,
+}
+
+
+def _normalize_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Числа з function calling приходять як float: 123.0 -> 123"""
+    return {
+        key: int(value) if isinstance(value, float) and value.is_integer() else value
+        for key, value in args.items()
+    }
+
+
+def _tool_cache_key(name: str, args: Dict[str, Any], data_version: str) -> tuple:
+    return (name, json.dumps(args, sort_keys=True, ensure_ascii=False, default=str), data_version)
+
+
+def cached_tool_result(name: str, args: Dict[str, Any], data_version: str) -> Optional[Dict[str, Any]]:
+    """Результат інструменту з кешу без виконання (None - ще не обчислено)"""
+    return tool_cache.get(_tool_cache_key(name, _normalize_args(args), data_version))
+
+
+def execute_tool(name: str, args: Dict[str, Any], db: Session, data_version: str) -> Dict[str, Any]:
+    """
+    Виконання інструменту з кешуванням
+
+    Returns:
+        Результат (JSON-сумісний dict) або {"error": ...}
+    """
+    function = TOOL_FUNCTIONS.get(name)
+    if not function:
+        return {"error": f"Невідомий інструмент: {name}"}
+
+    args = _normalize_args(args)
+    cache_key = _tool_cache_key(name, args, data_version)
+    cached = tool_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        result = _limit_result(_json_safe(function(db, **args)))
+    except Exception as e:
+        return {"error": f"Помилка інструменту {name}: {str(e)}"}
+
+    if not isinstance(result, dict):
+        result = {"result": result}
+    tool_cache.set(cache_key, result)
+    return result
+
+
+def gemini_tools() -> list:
+    """Опис інструментів у форматі Gemini (google.ai.generativelanguage)"""
+    import google.ai.generativelanguage as glm
+
+    type_map = {"string": glm.Type.STRING, "object": glm.Type.OBJECT}
+
+    declarations = []
+    for tool in TOOL_DECLARATIONS:
+        params = tool["parameters"]
+        properties = {
+            key: glm.Schema(type_=type_map[spec["type"]], description=spec.get("description", ""))
+            for key, spec in params.get("properties", {}).items()
+        }
+        declarations.append(glm.FunctionDeclaration(
+            name=tool["name"],
+            description=tool["description"],
+            parameters=glm.Schema(
+                type_=glm.Type.OBJECT,
+                properties=properties,
+                required=params.get("required", [])
+            ) if properties else None
+        ))
+
+    return [glm.Tool(function_declarations=declarations)]
@@ -0,0 +1,75 @@
+"""
+Кеш відповідей AI чату
+
+Ключ містить нормалізоване питання, прапорець include_context та версії
+даних (журнал змін БД і файли Excel), тому кеш автоматично стає
+неактуальним при зміні даних. Записи мають TTL та витісняються за LRU.
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "600"))  # Час життя відповіді, секунд
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "256"))  # Максимум відповідей у кеші
+
+
+def normalize_message(message: str) -> str:
+    """
+    Нормалізація питання: регістр, зайві пробіли, кінцева пунктуація
+    "Який перегул цього тижня?" == "який  перегул цього тижня"
+    """
+    text = re.sub(r"\s+", " ", message.strip().lower())
+    return text.rstrip("?!.,; ")
+
+
+class TTLCache:
+    """LRU кеш з часом життя записів"""
+
+    def __init__(self, max_size: int = CHAT_CACHE_SIZE, ttl: float = CHAT_CACHE_TTL):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Значення з кешу або None"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Зберегти значення"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Очистити кеш"""
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        """Статистика кешу"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Глобальний кеш відповідей чату
+chat_cache = TTLCache()
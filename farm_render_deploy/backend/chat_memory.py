@@ -0,0 +1,188 @@
+"""
+Пам'ять AI чату на сервері
+
+Повідомлення розмови зберігаються в таблиці chat_messages і лише
+додаються. У промпт потрапляє ковзне вікно останніх повідомлень, а
+старіші стискаються в підсумок розмови (chat_conversations.summary),
+тому повторні питання не пересилають всю історію.
+"""
+
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database.models import ChatConversation, ChatMessage
+
+DEFAULT_CONVERSATION_ID = "default"
+CHAT_MEMORY_WINDOW = int(os.getenv("CHAT_MEMORY_WINDOW", "10"))  # Повідомлень у ковзному вікні
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "2000"))  # Максимальна довжина підсумку
+MEMORY_MESSAGE_MAX_CHARS = 500  # Довжина повідомлення в промпті
+CONVERSATION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.:-]{1,64}$")
+
+
+def is_valid_conversation_id(conversation_id: str) -> bool:
+    """Перевірка ідентифікатора розмови"""
+    return bool(CONVERSATION_ID_PATTERN.match(conversation_id or ""))
+
+
+def _shorten(text: str, limit: int) -> str:
+    """Обрізання тексту до limit символів"""
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _summarize_turn(message: ChatMessage) -> str:
+    """Один рядок підсумку: питання повністю (коротко), відповідь - перше речення"""
+    if message.role == "user":
+        return f"- Питання: {_shorten(message.text, 200)}"
+    first_sentence = re.split(r"(?<=[.!?])\s", message.text.strip(), maxsplit=1)[0]
+    return f"  Відповідь: {_shorten(first_sentence, 200)}"
+
+
+def _find_conversation(db: Session, conversation_id: str) -> Optional[ChatConversation]:
+    """Розмова за ідентифікатором або None"""
+    return db.query(ChatConversation).filter(ChatConversation.id == conversation_id).first()
+
+
+def _insert_if_missing(db: Session, conversation_id: str):
+    """
+    Вставка розмови, якщо її ще немає (INSERT ... ON CONFLICT DO NOTHING)
+
+    Паралельний запит міг щойно створити ту саму розмову. Для інших СУБД -
+    точка збереження, відкат якої скасовує лише цю вставку.
+    """
+    values = {"id": conversation_id, "summarized_up_to": 0, "message_count": 0}
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.execute(insert(ChatConversation).values(**values).on_conflict_do_nothing(index_elements=["id"]))
+        return
+
+    try:
+        with db.begin_nested():
+            db.add(ChatConversation(**values))
+    except IntegrityError:
+        pass
+
+
+def get_or_create_conversation(db: Session, conversation_id: str) -> ChatConversation:
+    """Розмова за ідентифікатором (створюється при першому зверненні)"""
+    conversation = _find_conversation(db, conversation_id)
+    if conversation:
+        return conversation
+
+    _insert_if_missing(db, conversation_id)
+    return db.query(ChatConversation).filter(ChatConversation.id == conversation_id).one()
+
+
+def append_message(db: Session, conversation_id: str, role: str, text: str) -> ChatMessage:
+    """
+    Додавання повідомлення в розмову зі стисканням старих повідомлень
+    (без commit - викликаючий код завершує транзакцію)
+    """
+    conversation = get_or_create_conversation(db, conversation_id)
+
+    message = ChatMessage(conversation_id=conversation_id, role=role, text=text)
+    db.add(message)
+    conversation.message_count = (conversation.message_count or 0) + 1
+    conversation.updated_at = datetime.utcnow()
+    db.flush()
+
+    compact_conversation(db, conversation)
+    return message
+
+
+def compact_conversation(db: Session, conversation: ChatConversation):
+    """
+    Стискання повідомлень поза ковзним вікном у підсумок розмови
+    """
+    pending = db.query(ChatMessage).filter(
+        ChatMessage.conversation_id == conversation.id,
+        ChatMessage.id > (conversation.summarized_up_to or 0)
+    ).order_by(ChatMessage.id).all()
+
+    overflow = len(pending) - CHAT_MEMORY_WINDOW
+    if overflow <= 0:
+        return
+
+    compacted = pending[:overflow]
+    lines = [conversation.summary] if conversation.summary else []
+    lines.extend(_summarize_turn(message) for message in compacted)
+
+    summary = "\n".join(lines)
+    if len(summary) > CHAT_SUMMARY_MAX_CHARS:
+        # Зберігаємо найновішу частину підсумку
+        summary = "…" + summary[-(CHAT_SUMMARY_MAX_CHARS - 1):]
+
+    conversation.summary = summary
+    conversation.summarized_up_to = compacted[-1].id
+
+
+def remember_turn(bind, conversation_id: str, question: str, answer: str):
+    """
+    Збереження пари питання/відповідь в окремій сесії запису
+    (чат читає дані через сесію тільки для читання)
+    """
+    db = Session(bind=bind)
+    try:
+        append_message(db, conversation_id, "user", question)
+        append_message(db, conversation_id, "assistant", answer)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_messages(
+    db: Session,
+    conversation_id: str,
+    before: Optional[int] = None,
+    limit: int = 50
+) -> List[dict]:
+    """
+    Сторінка повідомлень розмови (хронологічно)
+
+    Args:
+        before: повернути повідомлення з id менше за цей (для старіших сторінок)
+        limit: кількість повідомлень на сторінці
+    """
+    query = db.query(ChatMessage).filter(ChatMessage.conversation_id == conversation_id)
+    if before:
+        query = query.filter(ChatMessage.id < before)
+
+    messages = query.order_by(ChatMessage.id.desc()).limit(limit).all()
+    return [message.to_dict() for message in reversed(messages)]
+
+
+def get_memory_context(db: Session, conversation_id: str) -> str:
+    """
+    Контекст попередньої розмови для промпту: підсумок та ковзне вікно
+    """
+    conversation = db.query(ChatConversation).filter(ChatConversation.id == conversation_id).first()
+    if not conversation:
+        return ""
+
+    window = db.query(ChatMessage).filter(
+        ChatMessage.conversation_id == conversation_id,
+        ChatMessage.id > (conversation.summarized_up_to or 0)
+    ).order_by(ChatMessage.id.desc()).limit(CHAT_MEMORY_WINDOW).all()
+
+    if not conversation.summary and not window:
+        return ""
+
+    parts = ["🧠 ПОПЕРЕДНЯ РОЗМОВА:"]
+    if conversation.summary:
+        parts.append(f"Підсумок раніших повідомлень:\n{conversation.summary}")
+    for message in reversed(window):
+        author = "Користувач" if message.role == "user" else "Асистент"
+        parts.append(f"{author}: {_shorten(message.text, MEMORY_MESSAGE_MAX_CHARS)}")
+
+    return "\n".join(parts) + "\n\n"
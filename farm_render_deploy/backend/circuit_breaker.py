@@ -0,0 +1,102 @@
+"""
+Запобіжник (circuit breaker) для викликів AI
+
+Після AI_BREAKER_FAILURES помилок або таймаутів поспіль запобіжник
+розмикається: протягом AI_BREAKER_RESET секунд запити до AI не надсилаються,
+а чат одразу відповідає локальною довідкою. Потім пропускається один пробний
+запит - успіх замикає запобіжник, помилка розмикає знову. Пробний запит,
+що не повідомив результат за AI_BREAKER_PROBE_TIMEOUT, вважається втраченим,
+і пропускається наступний.
+"""
+
+import os
+import time
+
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "3"))  # Помилок поспіль до розмикання
+AI_BREAKER_RESET = float(os.getenv("AI_BREAKER_RESET", "30"))  # Пауза до пробного запиту, секунд
+AI_BREAKER_PROBE_TIMEOUT = float(os.getenv("AI_BREAKER_PROBE_TIMEOUT", "150"))  # Максимум очікування результату проби, секунд
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Запобіжник з трьома станами: closed, open, half_open"""
+
+    def __init__(
+        self,
+        failure_threshold: int = AI_BREAKER_FAILURES,
+        reset_timeout: float = AI_BREAKER_RESET,
+        probe_timeout: float = AI_BREAKER_PROBE_TIMEOUT
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        """Розімкнено і пауза ще не минула (запит буде відхилено)"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow_request(self) -> bool:
+        """
+        Чи можна звертатися до AI
+
+        У стані half_open дозволяється лише один пробний запит. Дозволений
+        запит має завершитись record_success, record_failure або release.
+        """
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self._probe_in_flight:
+            # Проба без результату надто довго - вважається втраченою
+            if time.monotonic() - self.probe_started_at >= self.probe_timeout:
+                self._probe_in_flight = False
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            self.probe_started_at = time.monotonic()
+            return True
+
+        return False
+
+    def record_success(self):
+        """Успішний виклик - запобіжник замикається"""
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        """Помилка або таймаут upstream"""
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release(self):
+        """Виклик не відбувся з локальної причини (наприклад, черга переповнена)"""
+        self._probe_in_flight = False
+
+    @property
+    def stats(self) -> dict:
+        """Стан запобіжника"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "probe_in_flight": self._probe_in_flight,
+        }
+
+
+# Глобальний запобіжник для AI upstream
+ai_breaker = CircuitBreaker()
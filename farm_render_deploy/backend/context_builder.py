@@ -0,0 +1,119 @@
+"""
+Збирання контексту для AI промпту в межах бюджету токенів
+
+Контекст складається з розділів (дані БД, аркуші Excel, планові опороси...).
+До промпту потрапляють лише розділи, що стосуються питання, у порядку
+релевантності, поки не вичерпано бюджет токенів.
+"""
+
+import os
+import re
+from typing import Dict, List, Tuple
+
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))  # Бюджет токенів контексту
+CHARS_PER_TOKEN = 3  # Кирилиця займає більше токенів, ніж латиниця - оцінка з запасом
+
+# Ключові слова (основи) для кожного розділу
+SECTION_KEYWORDS = {
+    "db_sows": ["свиномат", "активн", "вибраков", "поголів"],
+    "db_weekly": ["тижн", "тижд", "опорос", "порос", "виживан", "народж", "мертв", "живих"],
+    "farm_summary": ["перегул", "осіменін", "тижн", "тижд", "статистик"],
+    "farm_sheets": ["аркуш", "колонк", "таблиц", "корм"],
+    "recent_weeks": ["перегул", "осіменін", "тижн", "тижд", "останн"],
+    "sows_summary": ["свиномат", "тест", "вагітн", "облік"],
+    "sows_sheets": ["аркуш", "колонк", "таблиц"],
+    "planned_farrowings": ["опорос", "планов", "прогноз", "корм", "вагітн"],
+    "sows_recent": ["свиномат", "тест", "осіменін", "останн"],
+    "rules": ["корм", "вагітн", "перегул", "правил", "норм"],
+}
+
+# Загальні питання (огляд, звіт) - релевантні всі розділи
+GENERAL_KEYWORDS = ["загальн", "підсум", "звіт", "огляд", "аналіз", "ситуац", "рекоменд"]
+
+# Розділи для питань без ключових слів (наприклад, привітання)
+FALLBACK_SECTIONS = ["db_sows", "farm_summary", "sows_summary"]
+
+# Розділи, що завжди мають найвищу релевантність (знайдені за питанням рядки)
+PINNED_SECTIONS = ["retrieved"]
+
+# Порядок розділів у промпті та пріоритет при однаковій релевантності
+SECTION_ORDER = [
+    "db_sows", "db_weekly",
+    "farm_summary", "recent_weeks", "farm_sheets",
+    "sows_summary", "planned_farrowings", "sows_recent", "sows_sheets",
+    "retrieved",
+    "rules",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизна кількість токенів у тексті"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def score_sections(message: str) -> Dict[str, int]:
+    """
+    Релевантність розділів для питання (кількість збігів ключових слів)
+    """
+    words = re.findall(r"\w+", message.lower())
+    scores = {}
+    for name, keywords in SECTION_KEYWORDS.items():
+        scores[name] = sum(1 for word in words for keyword in keywords if word.startswith(keyword))
+
+    if any(word.startswith(keyword) for word in words for keyword in GENERAL_KEYWORDS):
+        for name in scores:
+            scores[name] += 1
+
+    if not any(scores.values()):
+        for name in FALLBACK_SECTIONS:
+            scores[name] = 1
+
+    return scores
+
+
+def assemble_context(
+    message: str,
+    sections: Dict[str, str],
+    budget: int = CHAT_CONTEXT_TOKEN_BUDGET
+) -> Tuple[str, dict]:
+    """
+    Вибір релевантних розділів у межах бюджету токенів
+
+    Args:
+        message: питання користувача
+        sections: розділи контексту (назва -> текст)
+        budget: максимум токенів контексту
+
+    Returns:
+        (текст контексту, метадані: вибрані та пропущені розділи, токени)
+    """
+    scores = score_sections(message)
+    top_score = max(scores.values(), default=0) + 1
+    for name in PINNED_SECTIONS:
+        scores[name] = top_score
+    order = {name: index for index, name in enumerate(SECTION_ORDER)}
+
+    candidates = [name for name, text in sections.items() if text and scores.get(name, 0) > 0]
+    candidates.sort(key=lambda name: (-scores[name], order.get(name, len(order))))
+
+    selected: List[str] = []
+    skipped: List[str] = []
+    used_tokens = 0
+    for name in candidates:
+        tokens = estimate_tokens(sections[name])
+        if used_tokens + tokens > budget:
+            skipped.append(name)
+            continue
+        selected.append(name)
+        used_tokens += tokens
+
+    # У промпті розділи йдуть у природному порядку, а не за релевантністю
+    selected.sort(key=lambda name: order.get(name, len(order)))
+    context = "\n".join(sections[name] for name in selected)
+
+    return context, {
+        "sections": selected,
+        "skipped": skipped,
+        "tokens": used_tokens,
+        "budget": budget,
+    }
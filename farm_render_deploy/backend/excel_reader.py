@@ -2,6 +2,7 @@
 Модуль для читання даних з Excel файлів для AI аналітики
 ОНОВЛЕНО: Читає ВСІ аркуші, розраховує все автоматично
 """
+import os
 import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Any, Optional
@@ -20,6 +21,23 @@ class ExcelDataReader:
         self.PREGNANCY_DAYS = 114  # днів вагітності (3 місяці 3 тижні 3 дні)
         self.GOOD_REGUSTATION_THRESHOLD = 85  # % вище 85 - добре
     
+    def data_version(self) -> str:
+        """
+        Версія даних Excel файлів (час зміни та розмір кожного файлу)
+        
+        Returns:
+            Рядок, що змінюється при будь-якій зміні файлів
+        """
+        return "|".join(self.file_version(file_path) for file_path in (self.farm_file, self.sows_file))
+    
+    def file_version(self, file_path: Path) -> str:
+        """Версія одного файлу: час зміни та розмір ("-", якщо файлу немає)"""
+        try:
+            stat = file_path.stat()
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            return "-"
+    
     def read_all_sheets(self, file_path: Path) -> Dict[str, pd.DataFrame]:
         """
         Читає ВСІ аркуші з Excel файлу
@@ -219,27 +237,31 @@ class ExcelDataReader:
             print(f"Помилка читання облік свиноматок.xlsx: {e}")
             return None
     
-    def get_full_context(self) -> str:
+    def get_context_sections(self) -> Dict[str, str]:
         """
-        Генерує ПОВНИЙ детальний контекст для AI з ВСІХ аркушів та розрахунками
+        Контекст для AI по розділах, щоб у промпт можна було включати
+        лише потрібні частини
         
         Returns:
-            Форматований текст з даними для AI
+            Dict де ключ - назва розділу (farm_summary, farm_sheets, recent_weeks,
+            sows_summary, sows_sheets, planned_farrowings, sows_recent, rules),
+            значення - форматований текст
         """
-        context_parts = []
+        sections = {}
         
         # Дані з farm.xlsx - ВСІ АРКУШІ
         farm_data = self.read_farm_data()
         if farm_data:
-            context_parts.append(f"""
+            sections["farm_summary"] = f"""
 📊 ТИЖНЕВИЙ ОБЛІК (farm.xlsx):
 📁 Всього аркушів: {farm_data.get('total_sheets', 0)}
 📅 Тижнів в обліку: {farm_data.get('total_weeks', 0)}
 💉 Загальна кількість осіменінь: {farm_data.get('total_inseminations', 0)}
 📉 Середній % перегулу: {farm_data.get('avg_regustation_percent', 0)}%
-""")
+"""
             
             # Детально по кожному аркушу
+            context_parts = []
             for sheet_name, sheet_info in farm_data.get('sheets', {}).items():
                 context_parts.append(f"\n📄 Аркуш '{sheet_name}':")
                 context_parts.append(f"   - Рядків: {sheet_info.get('total_rows', 0)}")
@@ -255,11 +277,13 @@ class ExcelDataReader:
                 
                 if 'estimated_feed_kg' in sheet_info:
                     context_parts.append(f"   - Приблизна потреба корму: {sheet_info['estimated_feed_kg']} кг ({self.FEED_PER_SOW_KG} кг/свиня)")
+            if context_parts:
+                sections["farm_sheets"] = "\n".join(context_parts)
             
             # Останні тижні детально
             recent = farm_data.get('recent_weeks', [])[:5]
             if recent:
-                context_parts.append(f"\n📅 Останні 5 тижнів:")
+                context_parts = [f"\n📅 Останні 5 тижнів:"]
                 for i, week in enumerate(recent, 1):
                     week_num = week.get('№ тижня', 'N/A')
                     date = week.get('дата початку тижня', 'N/A')
@@ -267,20 +291,22 @@ class ExcelDataReader:
                     reg = week.get('% перегулу', 0)
                     reg_analysis = self.analyze_regustation(reg)
                     context_parts.append(f"   {i}. Тиждень {week_num} ({date}): {insem} осіменінь, перегул {reg}% - {reg_analysis}")
+                sections["recent_weeks"] = "\n".join(context_parts)
         
         # Дані з облік свиноматок.xlsx - ВСІ АРКУШІ + ПЛАНОВІ ОПОРОСИ
         sows_data = self.read_sows_data()
         if sows_data:
-            context_parts.append(f"""
+            sections["sows_summary"] = f"""
 
 🐷 ОБЛІК СВИНОМАТОК (облік свиноматок.xlsx):
 📁 Всього аркушів: {sows_data.get('total_sheets', 0)}
 📝 Всього записів: {sows_data.get('total_records', 0)}
 🐷 Унікальних свиноматок: {sows_data.get('unique_sows', 0)}
 ✅ Позитивних тестів на 28 день: {sows_data.get('positive_pregnancy_tests', 0)}
-""")
+"""
             
             # Детально по кожному аркушу
+            context_parts = []
             for sheet_name, sheet_info in sows_data.get('sheets', {}).items():
                 context_parts.append(f"\n📄 Аркуш '{sheet_name}':")
                 context_parts.append(f"   - Рядків: {sheet_info.get('total_rows', 0)}")
@@ -291,11 +317,13 @@ class ExcelDataReader:
                 
                 if 'positive_pregnancy_tests' in sheet_info:
                     context_parts.append(f"   - Позитивних тестів: {sheet_info['positive_pregnancy_tests']}")
+            if context_parts:
+                sections["sows_sheets"] = "\n".join(context_parts)
             
             # ПЛАНОВІ ОПОРОСИ (ПРОГНОЗ)
             planned = sows_data.get('planned_farrowings', [])[:10]
             if planned:
-                context_parts.append(f"\n🔮 ПРОГНОЗ ПЛАНОВИХ ОПОРОСІВ (перші 10):")
+                context_parts = [f"\n🔮 ПРОГНОЗ ПЛАНОВИХ ОПОРОСІВ (перші 10):"]
                 for i, plan in enumerate(planned, 1):
                     context_parts.append(
                         f"   {i}. Свиноматка {plan['sow']}: "
@@ -303,31 +331,50 @@ class ExcelDataReader:
                         f"плановий опорос {plan['planned_farrowing']} "
                         f"(потреба корму: {plan['feed_needed_kg']} кг)"
                     )
+                sections["planned_farrowings"] = "\n".join(context_parts)
             
             # Останні записи
             recent = sows_data.get('recent_records', [])[:5]
             if recent:
-                context_parts.append(f"\n📋 Останні 5 записів:")
+                context_parts = [f"\n📋 Останні 5 записів:"]
                 for i, record in enumerate(recent, 1):
                     sow_num = record.get('№ свиноматки', 'N/A')
                     date = record.get('Дата осіменіння', 'N/A')
                     test = record.get('28 день тест', 'N/A')
                     context_parts.append(f"   {i}. {sow_num} - {date}, тест: {test}")
+                sections["sows_recent"] = "\n".join(context_parts)
         
         # Загальні правила та константи
-        context_parts.append(f"""
+        sections["rules"] = self.rules_text()
+        
+        return sections
+    
+    def rules_text(self) -> str:
+        """
+        Загальні правила та константи (без читання файлів Excel)
+        """
+        return f"""
 
 📐 ПРАВИЛА ТА РОЗРАХУНКИ:
 - Вагітність триває: {self.PREGNANCY_DAYS} днів (3 місяці 3 тижні 3 дні)
 - Корм на свиню: {self.FEED_PER_SOW_KG} кг протягом вагітності
 - Добрий % перегулу: ≥ {self.GOOD_REGUSTATION_THRESHOLD}%
 - Поганий % перегулу: < {self.GOOD_REGUSTATION_THRESHOLD}% (потрібна увага!)
-""")
+"""
+    
+    def get_full_context(self) -> str:
+        """
+        Генерує ПОВНИЙ детальний контекст для AI з ВСІХ аркушів та розрахунками
+        
+        Returns:
+            Форматований текст з даними для AI
+        """
+        sections = self.get_context_sections()
         
-        if not context_parts:
+        if not sections:
             return "⚠️ Excel файли не знайдено або порожні"
         
-        return "\n".join(context_parts)
+        return "\n".join(sections.values())
     
     def search_sow(self, sow_number: str) -> Optional[Dict[str, Any]]:
         """
@@ -380,7 +427,7 @@ class ExcelDataReader:
 
 
 # Глобальний екземпляр для використання в API
-excel_reader = ExcelDataReader()
+excel_reader = ExcelDataReader(os.getenv("EXCEL_DIR", "."))
 
 
 def get_excel_context_for_ai() -> str:
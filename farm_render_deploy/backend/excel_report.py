@@ -0,0 +1,212 @@
+"""
+Звіт Excel (/api/report)
+
+Книга з аркушами: тижневі показники, свиноматки, планові опороси та потреба
+корму. Пишеться openpyxl у режимі write_only (рядки одразу скидаються на
+диск, пам'ять не залежить від розміру звіту) і зберігається у файл, який
+віддається частинами. Файл кешується за версією даних: повторне
+завантаження без змін у БД та Excel не генерує звіт заново.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterable, List
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from sqlalchemy.orm import Session
+
+from database.models import WeeklyRecord, Sow
+
+REPORT_CACHE_DIR = Path(os.getenv("REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "farm_reports")))
+REPORT_CACHE_FILES = int(os.getenv("REPORT_CACHE_FILES", "4"))  # Скільки останніх звітів зберігати
+REPORT_CACHE_GRACE = int(os.getenv("REPORT_CACHE_GRACE", "600"))  # Секунд, поки звіт ще може віддаватись
+REPORT_FILENAME = "farm_report.xlsx"
+
+DB_BATCH_SIZE = 500  # Рядків БД за одне звернення (yield_per)
+HEADER_FONT = Font(bold=True)
+
+
+def report_path(data_version: str) -> Path:
+    """Шлях до файлу звіту для версії даних"""
+    digest = hashlib.sha1(data_version.encode("utf-8")).hexdigest()[:16]
+    return REPORT_CACHE_DIR / f"report-{digest}.xlsx"
+
+
+def _add_sheet(workbook: Workbook, title: str, headers: List[str], widths: List[int], rows: Iterable[list]):
+    """Аркуш з жирним заголовком; рядки пишуться по одному"""
+    sheet = workbook.create_sheet(title)
+    for index, width in enumerate(widths):
+        sheet.column_dimensions[chr(ord("A") + index)].width = width
+    sheet.freeze_panes = "A2"
+
+    header = []
+    for name in headers:
+        cell = WriteOnlyCell(sheet, value=name)
+        cell.font = HEADER_FONT
+        header.append(cell)
+    sheet.append(header)
+
+    for row in rows:
+        sheet.append(row)
+
+
+def weekly_rows(db: Session):
+    """Тижневі показники (від найновішого тижня)"""
+    query = db.query(WeeklyRecord).order_by(WeeklyRecord.week_start_date.desc()).yield_per(DB_BATCH_SIZE)
+    for record in query:
+        alive = record.piglets_born_alive or 0
+        dead = record.piglets_born_dead or 0
+        farrowings = record.farrowings or 0
+        yield [
+            record.week_start_date,
+            farrowings,
+            alive,
+            dead,
+            alive + dead,
+            round(record.survival_rate or 0, 2),
+            round(alive / farrowings, 2) if farrowings else None,
+            record.notes,
+        ]
+
+
+def sow_rows(db: Session):
+    """Список свиноматок з віком"""
+    today = date.today()
+    query = db.query(Sow).order_by(Sow.number).yield_per(DB_BATCH_SIZE)
+    for sow in query:
+        age_months = None
+        if sow.birth_date:
+            age_months = (today.year - sow.birth_date.year) * 12 + today.month - sow.birth_date.month
+        yield [sow.number, sow.birth_date, age_months, sow.status, sow.notes]
+
+
+def planned_farrowings() -> List[dict]:
+    """
+    Планові опороси з обліку свиноматок: усі записи з позитивним тестом
+    на 28 день (без обмеження перших рядків, як у контексті AI)
+    """
+    from backend.excel_reader import excel_reader
+
+    planned = []
+    for df in excel_reader.read_all_sheets(excel_reader.sows_file).values():
+        if "Дата осіменіння" not in df.columns or "28 день тест" not in df.columns:
+            continue
+
+        positive = df[df["28 день тест"] == "+"]
+        sows = positive["№ свиноматки"] if "№ свиноматки" in positive.columns else ["N/A"] * len(positive)
+        for sow, insemination in zip(sows, positive["Дата осіменіння"]):
+            farrowing = excel_reader.calculate_farrowing_date(insemination)
+            if farrowing:
+                planned.append({
+                    "sow": sow,
+                    "insemination_date": str(insemination).split()[0],
+                    "planned_farrowing": datetime.strptime(farrowing, "%d.%m.%Y").date(),
+                    "feed_needed_kg": excel_reader.FEED_PER_SOW_KG,
+                })
+
+    planned.sort(key=lambda plan: plan["planned_farrowing"])
+    return planned
+
+
+def feed_rows(planned: List[dict]):
+    """Потреба корму по місяцях планового опоросу та разом"""
+    months = defaultdict(lambda: [0, 0])
+    for plan in planned:
+        month = months[plan["planned_farrowing"].strftime("%Y-%m")]
+        month[0] += 1
+        month[1] += plan["feed_needed_kg"]
+
+    for month, (sows, feed) in sorted(months.items()):
+        yield [month, sows, feed]
+    yield ["Разом", len(planned), sum(plan["feed_needed_kg"] for plan in planned)]
+
+
+def write_report(db: Session, path: Path):
+    """Згенерувати звіт у файл (спершу тимчасовий, потім атомарна заміна)"""
+    planned = planned_farrowings()
+
+    workbook = Workbook(write_only=True)
+    _add_sheet(
+        workbook,
+        "Тижневі показники",
+        ["Тиждень", "Опороси", "Живих", "Мертвих", "Всього", "Виживаність, %", "Живих на опорос", "Примітки"],
+        [12, 10, 10, 10, 10, 15, 16, 40],
+        weekly_rows(db),
+    )
+    _add_sheet(
+        workbook,
+        "Свиноматки",
+        ["Номер", "Дата народження", "Вік, міс.", "Статус", "Примітки"],
+        [12, 16, 10, 14, 40],
+        sow_rows(db),
+    )
+    _add_sheet(
+        workbook,
+        "Планові опороси",
+        ["Свиноматка", "Дата осіменіння", "Плановий опорос", "Корм, кг"],
+        [12, 16, 16, 10],
+        (
+            [plan["sow"], plan["insemination_date"], plan["planned_farrowing"], plan["feed_needed_kg"]]
+            for plan in planned
+        ),
+    )
+    _add_sheet(
+        workbook,
+        "Корм",
+        ["Місяць опоросу", "Свиноматок", "Корм, кг"],
+        [16, 12, 12],
+        feed_rows(planned),
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    workbook.save(temp_path)
+    os.replace(temp_path, path)
+
+
+def cleanup_reports(keep: Path):
+    """
+    Видалити найстаріші звіти понад REPORT_CACHE_FILES
+
+    Звіти, використані за останні REPORT_CACHE_GRACE секунд, не видаляються:
+    їх ще може віддавати інший запит (build_report оновлює mtime при видачі).
+    """
+    reports = []
+    for file in REPORT_CACHE_DIR.glob("report-*.xlsx"):
+        try:
+            reports.append((file.stat().st_mtime, file))
+        except OSError:
+            pass  # Видалений паралельно
+    reports.sort(reverse=True)
+
+    cutoff = time.time() - REPORT_CACHE_GRACE
+    for mtime, old in reports[max(1, REPORT_CACHE_FILES):]:
+        if old != keep and mtime < cutoff:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def build_report(db: Session, data_version: str) -> Path:
+    """
+    Файл звіту для версії даних
+
+    Returns:
+        Шлях до готового файлу (з кешу або щойно згенерованого)
+    """
+    path = report_path(data_version)
+    if path.exists():
+        os.utime(path)  # Нещодавно використаний - не видаляється першим
+        return path
+
+    write_report(db, path)
+    cleanup_reports(path)
+    return path
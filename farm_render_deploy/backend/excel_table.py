@@ -0,0 +1,312 @@
+"""
+Посторінковий перегляд аркушів Excel
+
+Клієнт отримує лише рядки поточної сторінки та типи колонок
+(number, date, boolean, text) для форматування і вирівнювання.
+
+Розібрані аркуші кешуються за версією файлу (WorkbookSnapshots), тож
+гортання, фільтри, сортування та пошук не парсять Excel повторно.
+Фільтри, сортування та пошук обчислюються векторно над DataFrame; порядок
+рядків запиту кешується, щоб наступні сторінки не перераховувались.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import operator
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Джерела таблиць: назва -> атрибут ExcelDataReader з шляхом до файлу
+TABLE_SOURCES = {
+    "farm": "farm_file",
+    "sows": "sows_file",
+}
+
+# Оператори фільтрів: колонка:оператор:значення
+FILTER_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "contains": None,
+}
+
+QUERY_CACHE_SIZE = 16  # Запитів (порядків рядків) на аркуш
+TRUE_VALUES = {"true", "1", "так", "yes", "+"}
+
+
+class TableQueryError(ValueError):
+    """Невірний параметр запиту таблиці (колонка, оператор, значення)"""
+
+
+class StaleCursor(TableQueryError):
+    """Курсор від іншої версії файлу або іншого запиту"""
+
+
+def column_type(series: pd.Series) -> str:
+    """Тип колонки для клієнта"""
+    if pd.api.types.is_bool_dtype(series):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(series):
+        return "number"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "date"
+
+    values = series.dropna()
+    if len(values) and all(isinstance(value, (date, datetime)) for value in values):
+        return "date"
+    return "text"
+
+
+def cell_value(value: Any) -> Any:
+    """JSON-сумісне значення клітинки (порожні -> None, дати -> ISO)"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy скаляри
+        return cell_value(value.item())
+    return value
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    """Текст у нижньому регістрі, порожні клітинки лишаються NaN"""
+    return series.astype(str).str.lower().where(series.notna())
+
+
+class SheetSnapshot:
+    """Розібраний аркуш: дані, типи колонок та кеш порядків рядків запитів"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self.types = {name: column_type(self.df[name]) for name in self.df.columns}
+        self.names = {str(name): name for name in self.df.columns}
+        self._search_text: Optional[pd.Series] = None
+        self._queries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def columns(self) -> List[dict]:
+        return [{"name": str(name), "type": self.types[name]} for name in self.df.columns]
+
+    @property
+    def search_text(self) -> pd.Series:
+        """Усі клітинки рядка одним рядком тексту (для пошуку, рахується раз)"""
+        if self._search_text is None:
+            text = pd.Series("", index=self.df.index)
+            for name in self.df.columns:
+                text = text + " " + self.df[name].fillna("").astype(str).str.lower()
+            self._search_text = text
+        return self._search_text
+
+    def column(self, name: str):
+        """Оригінальна назва колонки за назвою від клієнта"""
+        if name not in self.names:
+            raise TableQueryError(f"Колонку '{name}' не знайдено")
+        return self.names[name]
+
+    def _filter_mask(self, name: str, op: str, value: str) -> pd.Series:
+        """Векторна умова фільтра"""
+        column = self.column(name)
+        if op not in FILTER_OPERATORS:
+            raise TableQueryError(f"Невідомий оператор '{op}'. Доступні: {', '.join(FILTER_OPERATORS)}")
+
+        series = self.df[column]
+        if op == "contains":
+            return _as_text(series).str.contains(value.lower(), regex=False, na=False)
+
+        kind = self.types[column]
+        try:
+            if kind == "number":
+                series, value = pd.to_numeric(series, errors="coerce"), float(value)
+            elif kind == "date":
+                series, value = pd.to_datetime(series, errors="coerce"), pd.Timestamp(value)
+            elif kind == "boolean":
+                value = value.strip().lower() in TRUE_VALUES
+            else:
+                series, value = _as_text(series), value.lower()
+        except (TypeError, ValueError):
+            raise TableQueryError(f"Невірне значення '{value}' для колонки '{name}' ({kind})")
+
+        # Порівнюються лише непорожні клітинки
+        present = series.notna()
+        mask = pd.Series(False, index=series.index)
+        mask[present] = FILTER_OPERATORS[op](series[present], value)
+        return mask
+
+    def _sort_key(self, series: pd.Series) -> pd.Series:
+        """Ключ сортування колонки за її типом (порожні - в кінці)"""
+        kind = self.types[series.name]
+        if kind == "date":
+            return pd.to_datetime(series, errors="coerce")
+        if kind in ("number", "boolean"):
+            return series
+        return _as_text(series)
+
+    def positions(self, filters: Tuple[tuple, ...], sort: Tuple[str, ...], search: str) -> np.ndarray:
+        """Позиції рядків, що відповідають запиту, у потрібному порядку"""
+        key = (filters, sort, search)
+        with self._lock:
+            cached = self._queries.get(key)
+            if cached is not None:
+                self._queries.move_to_end(key)
+                return cached
+
+        mask = np.ones(len(self.df), dtype=bool)
+        for name, op, value in filters:
+            mask &= self._filter_mask(name, op, value).to_numpy(dtype=bool)
+        if search:
+            mask &= self.search_text.str.contains(search.lower(), regex=False).to_numpy(dtype=bool)
+
+        frame = self.df[mask]
+        if sort:
+            by = [self.column(name.lstrip("-")) for name in sort]
+            frame = frame.sort_values(
+                by=by,
+                ascending=[not name.startswith("-") for name in sort],
+                key=self._sort_key,
+                kind="mergesort",  # Стабільне: однакові значення в порядку файлу
+                na_position="last",
+            )
+        result = frame.index.to_numpy()
+
+        with self._lock:
+            self._queries[key] = result
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return result
+
+
+class WorkbookSnapshots:
+    """Розібрані аркуші файлів Excel, кешовані за версією файлу"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, Dict[str, SheetSnapshot]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, excel_reader, file_path) -> Tuple[str, Dict[str, SheetSnapshot]]:
+        """Версія файлу та його аркуші (повторний парсинг лише після зміни файлу)"""
+        version = excel_reader.file_version(file_path)
+        entry = self._entries.get(str(file_path))
+        if entry is not None and entry[0] == version:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(str(file_path))
+            if entry is None or entry[0] != version:
+                sheets = excel_reader.read_all_sheets(file_path)
+                entry = (version, {name: SheetSnapshot(df) for name, df in sheets.items()})
+                self._entries[str(file_path)] = entry
+        return entry
+
+
+def _query_id(version: str, sheet: str, filters, sort, search) -> str:
+    """Відбиток версії файлу та запиту для перевірки курсора"""
+    raw = json.dumps([version, sheet, filters, sort, search], ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(query_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{query_id}:{offset}".encode()).decode()
+
+
+def decode_cursor(cursor: str, query_id: str) -> int:
+    """Зміщення з курсора; StaleCursor, якщо змінився файл або запит"""
+    try:
+        cursor_query, offset = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(":", 1)
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise TableQueryError("Невірний курсор")
+    if offset < 0:
+        raise TableQueryError("Невірний курсор")
+    if cursor_query != query_id:
+        raise StaleCursor("Дані або параметри таблиці змінились - почніть з першої сторінки")
+    return offset
+
+
+def parse_filters(filters: List[str]) -> Tuple[tuple, ...]:
+    """Фільтри 'колонка:оператор:значення'"""
+    parsed = []
+    for item in filters:
+        parts = item.split(":", 2)
+        if len(parts) != 3 or not parts[0]:
+            raise TableQueryError(f"Невірний фільтр '{item}' (очікується колонка:оператор:значення)")
+        parsed.append(tuple(parts))
+    return tuple(parsed)
+
+
+def parse_sort(sort: Optional[str]) -> Tuple[str, ...]:
+    """Сортування 'колонка1,-колонка2' ('-' - за спаданням)"""
+    return tuple(name.strip() for name in (sort or "").split(",") if name.strip().lstrip("-"))
+
+
+def sheet_page(
+    sheets: Dict[str, SheetSnapshot],
+    sheet: Optional[str],
+    offset: int,
+    limit: int,
+    version: str = "",
+    filters: Tuple[tuple, ...] = (),
+    sort: Tuple[str, ...] = (),
+    search: str = "",
+    cursor: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Сторінка аркуша
+
+    Args:
+        sheets: аркуші файлу (назва -> SheetSnapshot)
+        sheet: назва аркуша (None - перший)
+        offset: номер першого рядка сторінки (ігнорується, якщо є cursor)
+        limit: рядків на сторінці
+        version: версія файлу (для курсора)
+        filters, sort, search: параметри запиту (див. parse_filters, parse_sort)
+        cursor: next_cursor попередньої сторінки
+
+    Returns:
+        Колонки з типами, рядки сторінки (списки значень), кількість рядків,
+        що відповідають запиту, та курсор наступної сторінки, або None,
+        якщо аркуша немає
+    """
+    if not sheets:
+        return None
+
+    sheet = sheet or next(iter(sheets))
+    snapshot = sheets.get(sheet)
+    if snapshot is None:
+        return None
+
+    search = (search or "").strip()
+    query_id = _query_id(version, sheet, filters, sort, search)
+    if cursor:
+        offset = decode_cursor(cursor, query_id)
+
+    positions = snapshot.positions(filters, sort, search)
+    page = snapshot.df.iloc[positions[offset:offset + limit]]
+    next_offset = offset + limit
+    return {
+        "sheet": sheet,
+        "sheets": list(sheets),
+        "columns": snapshot.columns,
+        "rows": [[cell_value(value) for value in row] for row in page.itertuples(index=False)],
+        "total": len(positions),
+        "sheet_rows": len(snapshot.df),
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": encode_cursor(query_id, next_offset) if next_offset < len(positions) else None,
+    }
+
+
+# Глобальний кеш розібраних файлів для /api/table
+workbook_snapshots = WorkbookSnapshots()
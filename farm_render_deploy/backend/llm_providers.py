@@ -0,0 +1,241 @@
+"""
+Провайдери мовних моделей для AI чату
+
+Провайдер обирається змінною LLM_PROVIDER:
+- gemini - Google Gemini (потрібен GEMINI_API_KEY)
+- stub - локальна детермінована заглушка з налаштовуваною затримкою та
+  швидкістю токенів, для навантажувальних тестів без мережі та ключа
+"""
+
+import abc
+import asyncio
+import hashlib
+import os
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+
+# Параметри заглушки
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "300"))  # Затримка до першого токена
+STUB_TOKENS_PER_SEC = float(os.getenv("STUB_TOKENS_PER_SEC", "40"))  # Швидкість генерації
+STUB_RESPONSE_TOKENS = int(os.getenv("STUB_RESPONSE_TOKENS", "60"))  # Довжина відповіді в токенах
+
+# Тип функцій для виконання інструментів та викликів upstream
+ExecuteTool = Callable[[str, dict], Awaitable[dict]]
+RunCall = Callable[[Callable[[], Awaitable]], Awaitable]
+
+
+class ToolRoundsExceeded(RuntimeError):
+    """Модель не дала відповіді за допустиму кількість раундів інструментів"""
+
+
+async def _direct_call(make_call):
+    """Виклик без обмежувача"""
+    return await make_call()
+
+
+class LLMProvider(abc.ABC):
+    """
+    Базовий інтерфейс провайдера мовної моделі
+    Провайдер без generate не створюється (TypeError при створенні)
+    """
+
+    name = "base"
+    unavailable_detail = "AI сервіс недоступний"
+
+    @property
+    def available(self) -> bool:
+        """Чи налаштований провайдер"""
+        return True
+
+    def warm(self):
+        """Попереднє завантаження (викликається у фоні після старту)"""
+
+    @abc.abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Повна відповідь на промпт"""
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Відповідь фрагментами (за замовчуванням - одним фрагментом)"""
+        yield await self.generate(prompt)
+
+    async def generate_with_tools(
+        self,
+        prompt: str,
+        execute: ExecuteTool,
+        max_rounds: int,
+        run: RunCall = _direct_call
+    ) -> str:
+        """Відповідь з викликами інструментів (за замовчуванням - без інструментів)"""
+        return await run(lambda: self.generate(prompt))
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini (google.generativeai імпортується при першому зверненні)"""
+
+    name = "gemini"
+    unavailable_detail = "AI сервіс недоступний. Перевірте GEMINI_API_KEY в .env файлі"
+
+    def __init__(self, api_key: Optional[str] = GEMINI_API_KEY, model_name: str = GEMINI_MODEL):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._tools_model = None
+        self._lock = threading.Lock()
+        if not api_key:
+            print("⚠️  GEMINI_API_KEY не знайдено. AI чат не буде працювати.")
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def get_model(self, with_tools: bool = False):
+        """Ліниве створення моделі (з інструментами або без)"""
+        if not self.api_key:
+            return None
+
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    from backend.ai_tools import gemini_tools
+                    genai.configure(api_key=self.api_key)
+                    self._tools_model = genai.GenerativeModel(self.model_name, tools=gemini_tools())
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._tools_model if with_tools else self._model
+
+    def warm(self):
+        self.get_model()
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.get_model().generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.get_model().generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # Фрагмент без тексту (наприклад, заблокований фільтром)
+            if text:
+                yield text
+
+    async def generate_with_tools(
+        self,
+        prompt: str,
+        execute: ExecuteTool,
+        max_rounds: int,
+        run: RunCall = _direct_call
+    ) -> str:
+        import google.ai.generativelanguage as glm
+
+        model = self.get_model(with_tools=True)
+        contents = [glm.Content(role="user", parts=[glm.Part(text=prompt)])]
+
+        for _ in range(max_rounds + 1):
+            response = await run(lambda: model.generate_content_async(contents))
+            content = response.candidates[0].content
+            calls = [part.function_call for part in content.parts if "function_call" in part]
+
+            if not calls:
+                return response.text
+
+            # Виконання інструментів і передача результатів моделі
+            contents.append(content)
+            results = []
+            for call in calls:
+                result = await execute(call.name, dict(call.args))
+                results.append(glm.Part(function_response=glm.FunctionResponse(name=call.name, response=result)))
+            contents.append(glm.Content(role="function", parts=results))
+
+        raise ToolRoundsExceeded("AI перевищив допустиму кількість викликів інструментів")
+
+
+class StubProvider(LLMProvider):
+    """
+    Детермінована локальна заглушка
+
+    Відповідь залежить лише від промпту, затримка та швидкість генерації
+    налаштовуються, тож можна вимірювати накладні витрати самого бекенду.
+    """
+
+    name = "stub"
+    WORDS = [
+        "свиноматки", "опороси", "перегул", "осіменіння", "корм", "тиждень",
+        "виживаність", "поросята", "тест", "план", "показник", "норма",
+    ]
+
+    def __init__(
+        self,
+        latency_ms: float = STUB_LATENCY_MS,
+        tokens_per_sec: float = STUB_TOKENS_PER_SEC,
+        response_tokens: int = STUB_RESPONSE_TOKENS
+    ):
+        self.latency = max(0.0, latency_ms) / 1000
+        self.token_interval = 1 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        self.response_tokens = max(1, response_tokens)
+
+    def _tokens(self, prompt: str) -> list:
+        """Детермінована послідовність токенів для промпту"""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        tokens = ["[stub]"]
+        for i in range(self.response_tokens - 1):
+            tokens.append(self.WORDS[digest[i % len(digest)] % len(self.WORDS)])
+        return [token + " " for token in tokens[:-1]] + [tokens[-1]]
+
+    async def generate(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency + self.token_interval * self.response_tokens)
+        return "".join(self._tokens(prompt))
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(prompt):
+            await asyncio.sleep(self.token_interval)
+            yield token
+
+    async def generate_with_tools(
+        self,
+        prompt: str,
+        execute: ExecuteTool,
+        max_rounds: int,
+        run: RunCall = _direct_call
+    ) -> str:
+        # Один виклик інструменту, щоб навантажувальний тест проходив і цей шлях
+        if max_rounds > 0:
+            await run(lambda: asyncio.sleep(self.latency))
+            await execute("get_statistics_summary", {})
+        return await run(lambda: self.generate(prompt))
+
+
+PROVIDERS: Dict[str, type] = {
+    "gemini": GeminiProvider,
+    "stub": StubProvider,
+}
+
+_provider: Optional[LLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> LLMProvider:
+    """Провайдер, обраний змінною LLM_PROVIDER (створюється один раз)"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                provider_class = PROVIDERS.get(LLM_PROVIDER)
+                if provider_class is None:
+                    raise ValueError(
+                        f"Невідомий LLM_PROVIDER '{LLM_PROVIDER}'. Доступні: {', '.join(PROVIDERS)}"
+                    )
+                _provider = provider_class()
+    return _provider
+
+
+def set_provider(provider: LLMProvider):
+    """Заміна провайдера (наприклад, заглушка в бенчмарках)"""
+    global _provider
+    _provider = provider
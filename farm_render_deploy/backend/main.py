@@ -2,17 +2,26 @@
 Головний файл FastAPI серверу для системи обліку свиноферми
 """
 
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException
+import time
+
+# Вимірювання часу імпорту модулів (холодний старт)
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date
+import asyncio
 import sys
 import os
+import re
 
 # Додаємо шлях до database модуля
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from database.models import get_db, create_tables
+from database.models import get_db, get_read_db, create_tables, engine_registry
 from routes import (
     get_weekly_records,
     create_weekly_record,
@@ -22,15 +31,34 @@ from routes import (
     create_sow,
     update_sow,
     delete_sow,
+    get_sow_events,
+    get_events_in_range,
+    create_sow_event,
+    delete_sow_event,
+    get_changes,
     import_excel,
+    get_table_page,
+    get_report,
+    get_memory,
+    get_conversations,
+    add_memory_message,
+    delete_conversation,
     chat_with_ai,
+    chat_batch_with_ai,
+    stream_chat_with_ai,
+    prewarm,
     WeeklyRecordCreate,
     WeeklyRecordUpdate,
     SowCreate,
     SowUpdate,
-    ChatRequest
+    SowEventCreate,
+    MemoryMessageCreate,
+    ChatRequest,
+    ChatBatchRequest
 )
 
+IMPORT_TIME_MS = round((time.perf_counter() - _import_started) * 1000, 1)
+
 # Створення FastAPI додатку
 app = FastAPI(
     title="Farm AI Chat API",
@@ -47,18 +75,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Префікс шляху ферми: /farms/{farm_id}/api/...
+FARM_PATH_PREFIX = re.compile(r"^/farms/([^/]+)(/.*)$")
+
+
+@app.middleware("http")
+async def farm_path_prefix(request: Request, call_next):
+    """
+    Запити з префіксом /farms/{farm_id} перенаправляються на звичайні
+    маршрути, а ідентифікатор ферми зберігається для get_db
+    """
+    match = FARM_PATH_PREFIX.match(request.scope["path"])
+    if match:
+        request.state.farm_id = match.group(1)
+        request.scope["path"] = match.group(2)
+    return await call_next(request)
+
+
 # Створення таблиць при запуску
 @app.on_event("startup")
 async def startup_event():
     """Подія при запуску серверу"""
     create_tables()
+    print(f"⏱  Імпорт модулів: {IMPORT_TIME_MS} мс")
+    
+    # Важкі модулі (pandas, Gemini) завантажуються у фоні, не затримуючи старт
+    asyncio.get_running_loop().run_in_executor(None, prewarm)
     print("✅ FastAPI сервер запущено!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Подія при зупинці серверу"""
+    engine_registry.dispose_all()
+
+
 # ============ WEEKLY RECORDS ENDPOINTS ============
 
 @app.get("/api/weekly-records", tags=["Weekly Records"])
-async def api_get_weekly_records(db: Session = Depends(get_db)):
+async def api_get_weekly_records(db: Session = Depends(get_read_db)):
     """
     Отримання всіх тижневих записів
     """
@@ -102,7 +157,7 @@ async def api_delete_weekly_record(
 # ============ SOWS ENDPOINTS ============
 
 @app.get("/api/sows", tags=["Sows"])
-async def api_get_sows(db: Session = Depends(get_db)):
+async def api_get_sows(db: Session = Depends(get_read_db)):
     """
     Отримання всіх свиноматок
     """
@@ -143,6 +198,68 @@ async def api_delete_sow(
     return await delete_sow(sow_id, db)
 
 
+# ============ SOW EVENTS ENDPOINTS ============
+
+@app.get("/api/sows/{sow_id}/events", tags=["Sow Events"])
+async def api_get_sow_events(sow_id: int, db: Session = Depends(get_read_db)):
+    """
+    Історія подій свиноматки
+    """
+    return await get_sow_events(sow_id, db)
+
+
+@app.post("/api/sows/{sow_id}/events", tags=["Sow Events"])
+async def api_create_sow_event(
+    sow_id: int,
+    sow_event: SowEventCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Додавання події свиноматки
+    """
+    return await create_sow_event(sow_id, sow_event, db)
+
+
+@app.get("/api/sow-events", tags=["Sow Events"])
+async def api_get_events_in_range(
+    start_date: date,
+    end_date: date,
+    event_type: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Події всіх свиноматок за період
+    event_type: 'осіменіння', 'тест_28' або 'опорос' (необов'язково)
+    """
+    return await get_events_in_range(start_date, end_date, event_type, db)
+
+
+@app.delete("/api/sow-events/{event_id}", tags=["Sow Events"])
+async def api_delete_sow_event(
+    event_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Видалення події свиноматки
+    """
+    return await delete_sow_event(event_id, db)
+
+
+# ============ CHANGE FEED ENDPOINT ============
+
+@app.get("/api/changes", tags=["Sync"])
+async def api_get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Зміни тижневих записів, свиноматок та подій після курсора since
+    Клієнт зберігає отриманий cursor і передає його в наступному запиті
+    """
+    return await get_changes(since, limit, db)
+
+
 # ============ IMPORT ENDPOINT ============
 
 @app.post("/api/import-excel", tags=["Import"])
@@ -153,7 +270,8 @@ async def api_import_excel(
 ):
     """
     Імпорт даних з Excel файлу
-    data_type: 'weekly' для тижневих записів, 'sows' для свиноматок
+    data_type: 'weekly' для тижневих записів, 'sows' для свиноматок,
+    'events' для історії свиноматок
     """
     return await import_excel(file, data_type, db)
 
@@ -163,12 +281,83 @@ async def api_import_excel(
 @app.post("/api/chat", tags=["AI"])
 async def api_chat(
     request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    write_db: Session = Depends(get_db)
 ):
     """
     Чат з AI асистентом для аналізу та рекомендацій
+    З conversation_id питання та відповідь зберігаються в пам'яті розмови
     """
-    return await chat_with_ai(request, db)
+    return await chat_with_ai(request, db, write_db)
+
+
+@app.post("/api/chat/batch", tags=["AI"])
+async def api_chat_batch(request: ChatBatchRequest, db: Session = Depends(get_read_db)):
+    """
+    Відповіді на список питань (щоденний звіт) зі спільним контекстом
+    """
+    return await chat_batch_with_ai(request, db)
+
+
+@app.post("/api/chat/stream", tags=["AI"])
+async def api_chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    db: Session = Depends(get_read_db),
+    write_db: Session = Depends(get_db)
+):
+    """
+    Чат з AI з потоковою відповіддю (Server-Sent Events)
+    Події: token - фрагмент відповіді, done - метадані, error - помилка
+    """
+    return await stream_chat_with_ai(request, db, http_request.is_disconnected, write_db)
+
+
+# ============ CHAT MEMORY ENDPOINTS ============
+
+@app.get("/api/memory", tags=["AI"])
+async def api_get_memory(
+    conversation_id: str = "default",
+    before: Optional[int] = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Повідомлення розмови з AI (сторінками, хронологічно)
+    before: id повідомлення, старіші за яке потрібно повернути
+    """
+    return await get_memory(conversation_id, before, limit, db)
+
+
+@app.get("/api/memory/conversations", tags=["AI"])
+async def api_get_conversations(db: Session = Depends(get_read_db)):
+    """
+    Список розмов з підсумками
+    """
+    return await get_conversations(db)
+
+
+@app.post("/api/memory/{conversation_id}", tags=["AI"])
+async def api_add_memory_message(
+    conversation_id: str,
+    message: MemoryMessageCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Додавання повідомлення в пам'ять розмови
+    """
+    return await add_memory_message(conversation_id, message, db)
+
+
+@app.delete("/api/memory/{conversation_id}", tags=["AI"])
+async def api_delete_conversation(
+    conversation_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Видалення розмови
+    """
+    return await delete_conversation(conversation_id, db)
 
 
 # ============ HEALTH CHECK ============
@@ -179,10 +368,17 @@ async def get_excel_data():
     Отримати дані з Excel файлів (farm.xlsx, облік свиноматок.xlsx)
     """
     from backend.excel_reader import excel_reader
+    from backend.single_flight import single_flight
+    
+    def read_excel_data():
+        return excel_reader.read_farm_data(), excel_reader.read_sows_data()
     
     try:
-        farm_data = excel_reader.read_farm_data()
-        sows_data = excel_reader.read_sows_data()
+        # Одночасні запити при тих самих файлах чекають на один парсинг
+        farm_data, sows_data = await single_flight.do(
+            ("excel_data", excel_reader.data_version()),
+            lambda: run_in_threadpool(read_excel_data)
+        )
         
         return {
             "status": "success",
@@ -201,10 +397,14 @@ async def get_excel_context():
     """
     Отримати форматований контекст з Excel файлів для AI
     """
-    from backend.excel_reader import get_excel_context_for_ai
+    from backend.excel_reader import excel_reader, get_excel_context_for_ai
+    from backend.single_flight import single_flight
     
     try:
-        context = get_excel_context_for_ai()
+        context = await single_flight.do(
+            ("excel_context", excel_reader.data_version()),
+            lambda: run_in_threadpool(get_excel_context_for_ai)
+        )
         return {
             "status": "success",
             "context": context
@@ -216,6 +416,32 @@ async def get_excel_context():
         )
 
 
+@app.get("/api/table", tags=["Excel"])
+async def api_table(
+    source: str = Query("farm", description="farm - farm.xlsx, sows - облік свиноматок.xlsx"),
+    sheet: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    sort: Optional[str] = Query(None, description="Колонки через кому, '-' - за спаданням"),
+    filters: List[str] = Query([], alias="filter", description="колонка:оператор:значення (eq, ne, lt, le, gt, ge, contains)"),
+    search: Optional[str] = Query(None, description="Текст у будь-якій клітинці рядка"),
+    cursor: Optional[str] = Query(None, description="next_cursor попередньої сторінки (замість offset)")
+):
+    """
+    Сторінка аркуша Excel: колонки з типами та лише рядки сторінки
+    Фільтри, сортування та пошук виконуються на сервері
+    """
+    return await get_table_page(source, sheet, offset, limit, sort, filters, search, cursor)
+
+
+@app.get("/api/report", tags=["Excel"])
+async def api_report(db: Session = Depends(get_read_db)):
+    """
+    Звіт Excel з кількома аркушами (файл віддається частинами)
+    """
+    return await get_report(db)
+
+
 @app.get("/api/search-sow/{sow_number}", tags=["Excel"])
 async def search_sow_in_excel(sow_number: str):
     """
@@ -262,10 +488,22 @@ async def health_check():
     """
     Детальна перевірка здоров'я системи
     """
+    from backend.ai_limiter import ai_limiter
+    from backend.circuit_breaker import ai_breaker
+    from backend.chat_cache import chat_cache
+    from backend.llm_providers import LLM_PROVIDER
+    from backend.single_flight import single_flight
+    
     return {
         "status": "healthy",
         "database": "connected",
-        "api": "operational"
+        "api": "operational",
+        "import_time_ms": IMPORT_TIME_MS,
+        "ai_provider": LLM_PROVIDER,
+        "ai_upstream": ai_limiter.stats,
+        "ai_breaker": ai_breaker.stats,
+        "chat_cache": chat_cache.stats,
+        "single_flight": single_flight.stats
     }
 
 
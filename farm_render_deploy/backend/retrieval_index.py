@@ -0,0 +1,350 @@
+"""
+Локальний пошуковий індекс (BM25) для AI чату
+
+Контекст чату містить лише перші рядки аркушів, тому питання про старіші
+тижні чи конкретних свиноматок лишаються без даних. Індекс охоплює всі
+рядки Excel файлів, тижневі записи та свиноматки з БД (разом з примітками),
+і до промпту додаються top-k найрелевантніших рядків.
+
+Оновлення інкрементальне: аркуші Excel переіндексуються лише при зміні
+відповідного файлу (один індекс на версію файлу для всіх ферм), а записи
+БД кожної ферми - за журналом змін (change_log) після останнього
+обробленого курсора.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.models import ChangeLog, Sow, WeeklyRecord
+
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))  # Рядків у контексті чату
+RETRIEVAL_INDEX_CACHE_SIZE = 8  # Максимум індексів (ферм) у пам'яті
+DOCUMENT_MAX_CHARS = 300  # Довжина рядка в контексті
+
+# Параметри BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Службові слова, що не впливають на релевантність
+STOP_WORDS = {
+    "і", "й", "та", "а", "але", "або", "в", "у", "на", "з", "із", "зі", "до", "по", "за", "від",
+    "про", "для", "що", "як", "це", "той", "ті", "чи", "не", "ні", "є", "був", "була",
+    "було", "були", "який", "яка", "яке", "які", "скільки", "коли", "де", "хто", "мені", "нам",
+}
+
+# Закінчення для спрощеного стемінгу (довші перевіряються першими)
+UKRAINIAN_ENDINGS = sorted([
+    "ами", "ями", "ові", "еві", "ого", "ому", "ими", "іми", "ість", "ості",
+    "ах", "ях", "ів", "їв", "ей", "ам", "ям", "ом", "ем", "ою", "ею", "ий", "ій", "ої",
+    "их", "іх", "ім", "им", "ти", "ть",
+    "єю", "єм",
+    "а", "я", "о", "е", "є", "у", "ю", "і", "ї", "и", "ь", "й",
+], key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+MAX_STEM_LENGTH = 7  # Довші основи обрізаються: "свиноматки" і "свиноматок" -> "свинома"
+
+# Сутності журналу змін, що індексуються
+INDEXED_ENTITIES = ("weekly_record", "sow")
+
+
+def _stem(word: str) -> str:
+    """Основа слова: відкидання закінчення та обрізання до MAX_STEM_LENGTH"""
+    if word.isdigit():
+        return word
+    for ending in UKRAINIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            word = word[:-len(ending)]
+            break
+    return word[:MAX_STEM_LENGTH]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Токени тексту українською: нижній регістр, апострофи, службові слова, основи
+    "123.0" з Excel -> "123"
+    """
+    text = re.sub(r"['’ʼ`]", "", text.lower())
+    text = re.sub(r"\b(\d+)\.0\b", r"\1", text)
+    return [_stem(word) for word in re.findall(r"\w+", text) if word not in STOP_WORDS]
+
+
+class BM25Index:
+    """Інвертований індекс BM25 з додаванням та видаленням документів"""
+
+    def __init__(self):
+        self.documents: Dict[str, dict] = {}  # ключ -> {"text", "source", "tf", "length"}
+        self.postings: Dict[str, set] = {}  # токен -> ключі документів
+        self.total_length = 0
+
+    def add(self, key: str, text: str, source: str):
+        """Додати або замінити документ"""
+        self.remove(key)
+        tokens = tokenize(text)
+        if not tokens:
+            return
+
+        tf = Counter(tokens)
+        self.documents[key] = {"text": text, "source": source, "tf": tf, "length": len(tokens)}
+        self.total_length += len(tokens)
+        for token in tf:
+            self.postings.setdefault(token, set()).add(key)
+
+    def remove(self, key: str):
+        """Видалити документ (якщо є)"""
+        document = self.documents.pop(key, None)
+        if not document:
+            return
+
+        self.total_length -= document["length"]
+        for token in document["tf"]:
+            keys = self.postings.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[token]
+
+    def remove_prefix(self, prefix: str):
+        """Видалити всі документи з ключем, що починається з prefix"""
+        for key in [key for key in self.documents if key.startswith(prefix)]:
+            self.remove(key)
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[dict]:
+        """Top-k документів за BM25 (див. search_indexes)"""
+        return search_indexes([self], query, k)
+
+
+def search_indexes(indexes: List[BM25Index], query: str, k: int = RETRIEVAL_TOP_K) -> List[dict]:
+    """
+    Top-k документів за BM25 у кількох індексах як в одному
+    (статистика колекції - кількість і середня довжина документів,
+    документна частота токена - рахується по всіх індексах разом)
+
+    Returns:
+        Список {"key", "source", "text", "score"} за спаданням релевантності
+    """
+    total = sum(len(index.documents) for index in indexes)
+    if not total:
+        return []
+
+    avg_length = sum(index.total_length for index in indexes) / total
+    scores: Dict[str, float] = {}
+    owners: Dict[str, BM25Index] = {}
+
+    for token in set(tokenize(query)):
+        postings = [(index, index.postings.get(token)) for index in indexes]
+        postings = [(index, keys) for index, keys in postings if keys]
+        frequency = sum(len(keys) for _, keys in postings)
+        if not frequency:
+            continue
+        idf = math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+        for index, keys in postings:
+            for key in keys:
+                document = index.documents[key]
+                freq = document["tf"][token]
+                norm = freq + BM25_K1 * (1 - BM25_B + BM25_B * document["length"] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * freq * (BM25_K1 + 1) / norm
+                owners[key] = index
+
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [
+        {
+            "key": key,
+            "source": owners[key].documents[key]["source"],
+            "text": owners[key].documents[key]["text"],
+            "score": round(score, 3),
+        }
+        for key, score in best
+    ]
+
+
+def _format_value(value) -> Optional[str]:
+    """Значення клітинки для тексту документа (порожні -> None)"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if hasattr(value, "strftime"):
+        try:
+            return value.strftime("%d.%m.%Y")
+        except ValueError:
+            return None  # NaT
+    text = str(value).strip()
+    return text or None
+
+
+def weekly_record_text(data: dict) -> str:
+    """Текст документа тижневого запису"""
+    text = (
+        f"Тиждень {data.get('week_start_date')}: {data.get('farrowings')} опоросів, "
+        f"{data.get('piglets_born_alive')} живих, {data.get('piglets_born_dead')} мертвих поросят, "
+        f"виживаність {round(data.get('survival_rate') or 0, 1)}%"
+    )
+    if data.get("notes"):
+        text += f". Примітки: {data['notes']}"
+    return text
+
+
+def sow_text(data: dict) -> str:
+    """Текст документа свиноматки"""
+    text = f"Свиноматка {data.get('number')} ({data.get('status')}), дата народження {data.get('birth_date')}"
+    if data.get("notes"):
+        text += f". Примітки: {data['notes']}"
+    return text
+
+
+ENTITY_TEXT = {
+    "weekly_record": ("Тижневі записи (БД)", weekly_record_text),
+    "sow": ("Свиноматки (БД)", sow_text),
+}
+
+
+class ExcelRetrievalIndex:
+    """
+    Індекси рядків файлів Excel, спільні для всіх ферм
+
+    Файли Excel однакові для всіх ферм, тому кожен файл індексується один
+    раз на версію (excel_reader.file_version). Побудований індекс версії
+    не змінюється, а замінюється новим, тож шукати в ньому можна без
+    блокування.
+    """
+
+    def __init__(self):
+        self._files: Dict[str, tuple] = {}  # назва файлу -> (версія, BM25Index)
+        self._lock = threading.Lock()
+
+    def _build(self, excel_reader, file_path) -> BM25Index:
+        """Індекс усіх рядків усіх аркушів файлу"""
+        index = BM25Index()
+        prefix = f"excel:{file_path.name}:"
+        for sheet_name, df in excel_reader.read_all_sheets(file_path).items():
+            columns = [str(column) for column in df.columns]
+            for row_number, row in enumerate(df.itertuples(index=False), 1):
+                values = [
+                    f"{column}: {value}"
+                    for column, value in zip(columns, map(_format_value, row))
+                    if value is not None
+                ]
+                if values:
+                    index.add(
+                        f"{prefix}{sheet_name}:{row_number}",
+                        "; ".join(values),
+                        f"{file_path.name}, аркуш '{sheet_name}', рядок {row_number}"
+                    )
+        return index
+
+    def get(self, excel_reader, build: bool = True) -> List[BM25Index]:
+        """
+        Індекси поточних версій файлів (переіндексація лише змінених)
+        build=False - лише вже побудовані індекси, без читання Excel
+        """
+        indexes = []
+        for file_path in (excel_reader.farm_file, excel_reader.sows_file):
+            version = excel_reader.file_version(file_path)
+            entry = self._files.get(file_path.name)
+            if not build and (entry is None or entry[0] != version):
+                continue
+            if entry is None or entry[0] != version:
+                with self._lock:
+                    entry = self._files.get(file_path.name)
+                    if entry is None or entry[0] != version:
+                        entry = (version, self._build(excel_reader, file_path))
+                        self._files[file_path.name] = entry
+            indexes.append(entry[1])
+        return indexes
+
+
+class FarmRetrievalIndex:
+    """Індекс записів БД однієї ферми"""
+
+    def __init__(self):
+        self.index = BM25Index()
+        self.cursor: Optional[int] = None  # Останній оброблений id журналу змін
+        self.lock = threading.Lock()
+
+    def refresh_db(self, db: Session):
+        """Повна індексація при першому зверненні, далі - лише зміни з журналу"""
+        if self.cursor is None:
+            self.cursor = db.query(func.max(ChangeLog.id)).scalar() or 0
+            for record in db.query(WeeklyRecord).all():
+                self._apply("weekly_record", record.id, record.to_dict())
+            for sow in db.query(Sow).all():
+                self._apply("sow", sow.id, sow.to_dict())
+            return
+
+        changes = db.query(ChangeLog).filter(ChangeLog.id > self.cursor).order_by(ChangeLog.id).all()
+        for change in changes:
+            if change.entity in INDEXED_ENTITIES:
+                data = json.loads(change.data) if change.operation == "upsert" and change.data else None
+                self._apply(change.entity, change.entity_id, data)
+            self.cursor = change.id
+
+    def _apply(self, entity: str, entity_id: int, data: Optional[dict]):
+        """Оновлення документа запису БД (data=None - видалення)"""
+        key = f"db:{entity}:{entity_id}"
+        if data is None:
+            self.index.remove(key)
+            return
+        source, make_text = ENTITY_TEXT[entity]
+        self.index.add(key, make_text(data), source)
+
+    def search(self, db: Session, query: str, k: int, build_excel: bool = True) -> List[dict]:
+        """Оновлення індексів та пошук у рядках Excel і записах ферми разом"""
+        from backend.excel_reader import excel_reader
+
+        excel_indexes = excel_index.get(excel_reader, build=build_excel)
+        with self.lock:
+            self.refresh_db(db)
+            return search_indexes(excel_indexes + [self.index], query, k)
+
+
+class RetrievalIndexRegistry:
+    """Індекси БД ферм (за URL бази даних) з витісненням найдавніше використаних"""
+
+    def __init__(self, max_size: int = RETRIEVAL_INDEX_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._indexes: "OrderedDict[str, FarmRetrievalIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> FarmRetrievalIndex:
+        """Індекс ферми, до якої прив'язана сесія"""
+        key = str(db.get_bind().url)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = FarmRetrievalIndex()
+                while len(self._indexes) > self.max_size:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(key)
+            return index
+
+    def search(self, db: Session, query: str, k: int = RETRIEVAL_TOP_K, build_excel: bool = True) -> List[dict]:
+        """
+        Найрелевантніші рядки для питання (викликати з потоку - може читати Excel)
+        build_excel=False - Excel не читається: пошук лише у вже проіндексованих файлах
+        """
+        return self.get(db).search(db, query, k, build_excel)
+
+
+def format_retrieved(hits: List[dict]) -> str:
+    """Розділ контексту зі знайденими рядками"""
+    if not hits:
+        return ""
+    lines = ["\n🔎 ЗНАЙДЕНІ ЗАПИСИ (за питанням):"]
+    for hit in hits:
+        text = hit["text"]
+        if len(text) > DOCUMENT_MAX_CHARS:
+            text = text[:DOCUMENT_MAX_CHARS - 1] + "…"
+        lines.append(f"- [{hit['source']}] {text}")
+    return "\n".join(lines)
+
+
+# Глобальні індекси: рядки Excel (спільні) та записи БД ферм
+excel_index = ExcelRetrievalIndex()
+retrieval_index = RetrievalIndexRegistry()
@@ -3,32 +3,50 @@ API маршрути та бізнес-логіка для системи обл
 """
 
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import Optional, List
-from datetime import date, datetime
-import pandas as pd
-import google.generativeai as genai
+from datetime import date, datetime, timedelta
+import asyncio
+import hashlib
+import json
 import os
 import sys
-from dotenv import load_dotenv
 
 # Додаємо шлях до database модуля
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from database.models import WeeklyRecord, Sow
+# Змінні середовища (.env) завантажуються один раз в database.models
+from database.models import WeeklyRecord, Sow, SowEvent, ChangeLog, ChatConversation, ChatMessage, SOW_EVENT_TYPES
+from backend.ai_limiter import ai_limiter, AI_REQUEST_TIMEOUT, AI_STREAM_TIMEOUT, AI_LATENCY_BUDGET
+from backend.circuit_breaker import ai_breaker
+from backend.chat_cache import chat_cache, normalize_message
+from backend.single_flight import single_flight
+from backend.context_builder import assemble_context
+from backend.retrieval_index import retrieval_index, format_retrieved
+from backend import chat_memory
+from backend.ai_tools import CHAT_USE_TOOLS, MAX_TOOL_ROUNDS, cached_tool_result, execute_tool
+from backend.llm_providers import LLMProvider, ToolRoundsExceeded, get_provider
+
+def prewarm():
+    """
+    Фонове завантаження важких модулів після старту серверу,
+    щоб перший запит до імпорту чи AI не чекав на них
+    """
+    import pandas  # noqa: F401
+    import backend.excel_reader  # noqa: F401
+    get_provider().warm()
 
-# Завантаження змінних середовища
-load_dotenv()
 
-# Налаштування Google Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-pro')
-else:
-    model = None
-    print("⚠️  GEMINI_API_KEY не знайдено. AI чат не буде працювати.")
+def get_available_provider() -> LLMProvider:
+    """Налаштований провайдер AI або 503"""
+    provider = get_provider()
+    if not provider.available:
+        raise HTTPException(status_code=503, detail=provider.unavailable_detail)
+    return provider
 
 
 # ============ PYDANTIC СХЕМИ ============
@@ -67,10 +85,39 @@ class SowUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+class SowEventCreate(BaseModel):
+    """Схема для створення події свиноматки"""
+    event_type: str = Field(..., pattern="^(осіменіння|тест_28|опорос)$", description="Тип події")
+    event_date: date
+    result: Optional[str] = Field(None, max_length=50, description="Результат (наприклад '+' для тесту)")
+    notes: Optional[str] = None
+
+
+class ChatBatchRequest(BaseModel):
+    """Схема для пакету питань (щоденний звіт)"""
+    questions: List[str] = Field(..., min_length=1, max_length=20, description="Питання до AI")
+    include_context: bool = Field(default=True, description="Включити контекст даних")
+
+
 class ChatRequest(BaseModel):
     """Схема для запиту до AI чату"""
     message: str = Field(..., min_length=1, description="Повідомлення користувача")
     include_context: bool = Field(default=True, description="Включити контекст даних")
+    conversation_id: Optional[str] = Field(
+        None,
+        pattern=r"^[A-Za-z0-9_.:-]{1,64}$",
+        description="Ідентифікатор розмови для серверної пам'яті чату"
+    )
+    use_tools: Optional[bool] = Field(
+        None,
+        description="Модель запитує дані через інструменти замість повного контексту (за замовчуванням CHAT_USE_TOOLS)"
+    )
+
+
+class MemoryMessageCreate(BaseModel):
+    """Схема для додавання повідомлення в пам'ять чату"""
+    role: str = Field(..., pattern="^(user|assistant)$")
+    text: str = Field(..., min_length=1)
 
 
 # ============ WEEKLY RECORDS ФУНКЦІЇ ============
@@ -238,6 +285,122 @@ async def delete_sow(sow_id: int, db: Session) -> dict:
     return {"message": "Свиноматку успішно видалено", "id": sow_id}
 
 
+# ============ SOW EVENTS ФУНКЦІЇ ============
+
+async def get_sow_events(sow_id: int, db: Session) -> dict:
+    """
+    Історія подій свиноматки (хронологічно)
+    """
+    db_sow = db.query(Sow).filter(Sow.id == sow_id).first()
+    
+    if not db_sow:
+        raise HTTPException(status_code=404, detail="Свиноматку не знайдено")
+    
+    events = db.query(SowEvent).filter(
+        SowEvent.sow_id == sow_id
+    ).order_by(SowEvent.event_date, SowEvent.id).all()
+    
+    return {
+        "sow": db_sow.to_dict(),
+        "events": [event.to_dict() for event in events]
+    }
+
+
+async def get_events_in_range(
+    start_date: date,
+    end_date: date,
+    event_type: Optional[str],
+    db: Session
+) -> List[dict]:
+    """
+    Всі події за період (наприклад, всі осіменіння цього тижня)
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="Кінцева дата раніше початкової")
+    
+    if event_type and event_type not in SOW_EVENT_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Невірний тип події. Використовуйте: {', '.join(SOW_EVENT_TYPES)}"
+        )
+    
+    query = db.query(SowEvent).filter(
+        SowEvent.event_date >= start_date,
+        SowEvent.event_date <= end_date
+    )
+    if event_type:
+        query = query.filter(SowEvent.event_type == event_type)
+    
+    events = query.order_by(SowEvent.event_date, SowEvent.id).all()
+    return [event.to_dict() for event in events]
+
+
+async def create_sow_event(sow_id: int, sow_event: SowEventCreate, db: Session) -> dict:
+    """
+    Додавання події в історію свиноматки
+    """
+    db_sow = db.query(Sow).filter(Sow.id == sow_id).first()
+    
+    if not db_sow:
+        raise HTTPException(status_code=404, detail="Свиноматку не знайдено")
+    
+    db_event = SowEvent(
+        sow_id=sow_id,
+        event_type=sow_event.event_type,
+        event_date=sow_event.event_date,
+        result=sow_event.result,
+        notes=sow_event.notes
+    )
+    
+    db.add(db_event)
+    db.commit()
+    db.refresh(db_event)
+    
+    return db_event.to_dict()
+
+
+async def delete_sow_event(event_id: int, db: Session) -> dict:
+    """
+    Видалення події свиноматки
+    """
+    db_event = db.query(SowEvent).filter(SowEvent.id == event_id).first()
+    
+    if not db_event:
+        raise HTTPException(status_code=404, detail="Подію не знайдено")
+    
+    db.delete(db_event)
+    db.commit()
+    
+    return {"message": "Подію успішно видалено", "id": event_id}
+
+
+# ============ CHANGE FEED ФУНКЦІЯ ============
+
+async def get_changes(since: int, limit: int, db: Session) -> dict:
+    """
+    Зміни після курсора для дельта-синхронізації клієнтів
+    Для кожного запису повертається лише остання зміна в межах сторінки
+    """
+    changes = db.query(ChangeLog).filter(
+        ChangeLog.id > since
+    ).order_by(ChangeLog.id).limit(limit + 1).all()
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    latest = {}
+    for change in changes:
+        key = (change.entity, change.entity_id)
+        latest.pop(key, None)
+        latest[key] = change
+    
+    return {
+        "changes": [change.to_dict() for change in latest.values()],
+        "cursor": changes[-1].id if changes else since,
+        "has_more": has_more
+    }
+
+
 # ============ IMPORT ФУНКЦІЯ ============
 
 async def import_excel(file: UploadFile, data_type: str, db: Session) -> dict:
@@ -250,6 +413,8 @@ async def import_excel(file: UploadFile, data_type: str, db: Session) -> dict:
             detail="Файл повинен бути в форматі Excel (.xlsx або .xls)"
         )
     
+    import pandas as pd
+    
     try:
         # Читання Excel файлу
         contents = await file.read()
@@ -330,10 +495,57 @@ async def import_excel(file: UploadFile, data_type: str, db: Session) -> dict:
                 except Exception as e:
                     errors.append(f"Рядок {index + 2}: {str(e)}")
         
+        elif data_type == "events":
+            # Імпорт історії свиноматок (формат облік свиноматок.xlsx)
+            required_columns = ['№ свиноматки', 'Дата осіменіння']
+            
+            for index, row in df.iterrows():
+                try:
+                    number = str(row['№ свиноматки']).strip()
+                    sow = db.query(Sow).filter(Sow.number == number).first()
+                    
+                    if not sow:
+                        errors.append(f"Рядок {index + 2}: свиноматку {number} не знайдено")
+                        continue
+                    
+                    insemination_date = pd.to_datetime(row['Дата осіменіння']).date()
+                    events = [("осіменіння", insemination_date, None)]
+                    
+                    test_result = row.get('28 день тест')
+                    if pd.notna(test_result):
+                        events.append(("тест_28", insemination_date + timedelta(days=28), str(test_result).strip()))
+                    
+                    farrowing_date = row.get('Дата опоросу')
+                    if pd.notna(farrowing_date):
+                        events.append(("опорос", pd.to_datetime(farrowing_date).date(), None))
+                    
+                    for event_type, event_date, result in events:
+                        # Повторний імпорт не дублює події
+                        existing = db.query(SowEvent).filter(
+                            SowEvent.sow_id == sow.id,
+                            SowEvent.event_type == event_type,
+                            SowEvent.event_date == event_date
+                        ).first()
+                        
+                        if existing:
+                            existing.result = result
+                        else:
+                            db.add(SowEvent(
+                                sow_id=sow.id,
+                                event_type=event_type,
+                                event_date=event_date,
+                                result=result
+                            ))
+                    
+                    imported_count += 1
+                    
+                except Exception as e:
+                    errors.append(f"Рядок {index + 2}: {str(e)}")
+        
         else:
             raise HTTPException(
                 status_code=400,
-                detail="Невірний тип даних. Використовуйте 'weekly' або 'sows'"
+                detail="Невірний тип даних. Використовуйте 'weekly', 'sows' або 'events'"
             )
         
         db.commit()
@@ -352,55 +564,147 @@ async def import_excel(file: UploadFile, data_type: str, db: Session) -> dict:
         )
 
 
-# ============ AI CHAT ФУНКЦІЯ ============
+# ============ ТАБЛИЦІ EXCEL ============
 
-async def chat_with_ai(request: ChatRequest, db: Session) -> dict:
+async def get_table_page(
+    source: str,
+    sheet: Optional[str],
+    offset: int,
+    limit: int,
+    sort: Optional[str] = None,
+    filters: Optional[List[str]] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> dict:
     """
-    Чат з AI асистентом (з даними з БД та Excel файлів)
+    Сторінка аркуша Excel для перегляду таблиці з фільтрами, сортуванням та пошуком
+    Аркуші беруться з кешу розібраних файлів (парсинг у потоці лише після зміни файлу)
     """
-    if not model:
+    from backend.excel_reader import excel_reader
+    from backend.excel_table import (
+        TABLE_SOURCES, StaleCursor, TableQueryError,
+        parse_filters, parse_sort, sheet_page, workbook_snapshots
+    )
+    
+    if source not in TABLE_SOURCES:
         raise HTTPException(
-            status_code=503,
-            detail="AI сервіс недоступний. Перевірте GEMINI_API_KEY в .env файлі"
+            status_code=400,
+            detail=f"Невідоме джерело '{source}'. Доступні: {', '.join(TABLE_SOURCES)}"
         )
     
+    file_path = getattr(excel_reader, TABLE_SOURCES[source])
+    version, sheets = await run_in_threadpool(workbook_snapshots.get, excel_reader, file_path)
+    if not sheets:
+        raise HTTPException(status_code=404, detail=f"Файл {file_path.name} не знайдено або він порожній")
+    
     try:
-        # Імпорт модуля для читання Excel
-        from backend.excel_reader import get_excel_context_for_ai
-        
-        # Підготовка контексту з даними
-        context = ""
-        
-        if request.include_context:
-            # 1. ДАНІ З БАЗИ ДАНИХ (SQLite)
-            recent_records = db.query(WeeklyRecord).order_by(
-                WeeklyRecord.week_start_date.desc()
-            ).limit(10).all()
-            
-            active_sows = db.query(Sow).filter(Sow.status == "активна").count()
-            total_sows = db.query(Sow).count()
-            
-            # Формування контексту з БД
-            context = f"""
-📊 ДАНІ З БАЗИ ДАНИХ (farm.db):
+        page = await run_in_threadpool(
+            sheet_page, sheets, sheet, offset, limit,
+            version, parse_filters(filters or []), parse_sort(sort), search or "", cursor
+        )
+    except StaleCursor as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except TableQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Аркуш '{sheet}' не знайдено")
+    
+    return {"source": source, **page}
 
-Свиноматки в БД:
-- Всього: {total_sows}
-- Активних: {active_sows}
-- Вибракуваних: {total_sows - active_sows}
 
-Останні тижневі записи в БД:
-"""
-            for record in recent_records:
-                total_born = record.piglets_born_alive + record.piglets_born_dead
-                context += f"\n- Тиждень {record.week_start_date}: {record.farrowings} опоросів, {total_born} поросят (виживаність: {record.survival_rate:.1f}%)"
-            
-            # 2. ДАНІ З EXCEL ФАЙЛІВ
-            excel_context = get_excel_context_for_ai()
-            context += f"\n\n{excel_context}\n\n"
-        
-        # Системний промпт
-        system_prompt = """Ти - експертний AI асистент для управління свинофермою. 
+# ============ ЗВІТ EXCEL ============
+
+async def get_report(db: Session) -> FileResponse:
+    """
+    Звіт Excel (тижневі показники, свиноматки, планові опороси, корм)
+    Файл кешується за версією даних; однакові одночасні запити генерують його один раз
+    """
+    from backend.excel_report import REPORT_FILENAME, build_report
+    
+    data_version = get_data_version(db)
+    bind = db.get_bind()
+    
+    def generate():
+        # Спільна генерація може пережити запит-ініціатор - власна сесія
+        report_db = Session(bind=bind)
+        try:
+            return build_report(report_db, data_version)
+        finally:
+            report_db.close()
+    
+    try:
+        # Ключ - версія даних (містить базу ферми), а не сесія запиту
+        path = await single_flight.do(("report", data_version), lambda: run_in_threadpool(generate))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Помилка формування звіту: {str(e)}"
+        )
+    
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=REPORT_FILENAME
+    )
+
+
+# ============ CHAT MEMORY ФУНКЦІЇ ============
+
+def _check_conversation_id(conversation_id: str):
+    """Перевірка ідентифікатора розмови"""
+    if not chat_memory.is_valid_conversation_id(conversation_id):
+        raise HTTPException(status_code=400, detail=f"Невірний ідентифікатор розмови: {conversation_id}")
+
+
+async def get_memory(conversation_id: str, before: Optional[int], limit: int, db: Session) -> List[dict]:
+    """
+    Сторінка повідомлень розмови (хронологічно)
+    """
+    _check_conversation_id(conversation_id)
+    return chat_memory.get_messages(db, conversation_id, before=before, limit=limit)
+
+
+async def get_conversations(db: Session) -> List[dict]:
+    """
+    Всі розмови (останні оновлені першими)
+    """
+    conversations = db.query(ChatConversation).order_by(ChatConversation.updated_at.desc()).all()
+    return [conversation.to_dict() for conversation in conversations]
+
+
+async def add_memory_message(conversation_id: str, message: MemoryMessageCreate, db: Session) -> dict:
+    """
+    Додавання повідомлення в пам'ять розмови
+    """
+    _check_conversation_id(conversation_id)
+    db_message = chat_memory.append_message(db, conversation_id, message.role, message.text)
+    db.commit()
+    db.refresh(db_message)
+    
+    return db_message.to_dict()
+
+
+async def delete_conversation(conversation_id: str, db: Session) -> dict:
+    """
+    Видалення розмови разом з усіма повідомленнями
+    """
+    conversation = db.query(ChatConversation).filter(ChatConversation.id == conversation_id).first()
+    
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Розмову не знайдено")
+    
+    db.query(ChatMessage).filter(ChatMessage.conversation_id == conversation_id).delete()
+    db.delete(conversation)
+    db.commit()
+    
+    return {"message": "Розмову успішно видалено", "id": conversation_id}
+
+
+# ============ AI CHAT ФУНКЦІЯ ============
+
+# Системний промпт
+SYSTEM_PROMPT = """Ти - експертний AI асистент для управління свинофермою. 
 Твоя роль - аналізувати дані з бази даних та Excel файлів (farm.xlsx, облік свиноматок.xlsx), 
 давати практичні рекомендації та відповідати на питання фермерів українською мовою.
 
@@ -411,19 +715,617 @@ async def chat_with_ai(request: ChatRequest, db: Session) -> dict:
 Будь конкретним, професійним та корисним. Використовуй надані дані для точних відповідей.
 Якщо бачиш розбіжності між БД та Excel - поясни це користувачу.
 Надавай рекомендації на основі показників виживаності, відсотка перегулу, кількості опоросів."""
+
+
+def build_db_context_sections(db: Session) -> dict:
+    """
+    Розділи контексту з бази даних (свиноматки та тижневі записи)
+    """
+    recent_records = db.query(WeeklyRecord).order_by(
+        WeeklyRecord.week_start_date.desc()
+    ).limit(10).all()
+    
+    active_sows = db.query(Sow).filter(Sow.status == "активна").count()
+    total_sows = db.query(Sow).count()
+    
+    sections = {
+        "db_sows": f"""
+📊 ДАНІ З БАЗИ ДАНИХ (farm.db):
+
+Свиноматки в БД:
+- Всього: {total_sows}
+- Активних: {active_sows}
+- Вибракуваних: {total_sows - active_sows}
+"""
+    }
+    
+    if recent_records:
+        weekly = "Останні тижневі записи в БД:\n"
+        for record in recent_records:
+            total_born = record.piglets_born_alive + record.piglets_born_dead
+            weekly += f"\n- Тиждень {record.week_start_date}: {record.farrowings} опоросів, {total_born} поросят (виживаність: {record.survival_rate:.1f}%)"
+        sections["db_weekly"] = weekly
+    
+    return sections
+
+
+async def build_context_sections(db: Session) -> dict:
+    """
+    Всі розділи контексту (БД та Excel) до вибору за питанням
+    """
+    # Імпорт модуля для читання Excel
+    from backend.excel_reader import excel_reader
+    
+    # 1. ДАНІ З БАЗИ ДАНИХ (SQLite)
+    sections = build_db_context_sections(db)
+    
+    # 2. ДАНІ З EXCEL ФАЙЛІВ (парсинг у потоці, щоб не блокувати event loop;
+    #    одночасні запити при тих самих файлах чекають на один парсинг)
+    sections.update(await single_flight.do(
+        ("excel_sections", excel_reader.data_version()),
+        lambda: run_in_threadpool(excel_reader.get_context_sections)
+    ))
+    
+    return sections
+
+
+async def build_chat_context(
+    message: str,
+    include_context: bool,
+    db: Session,
+    sections: Optional[dict] = None
+) -> str:
+    """
+    Контекст з даними з БД та Excel файлів для промпту
+    Включаються лише розділи, релевантні питанню, в межах бюджету токенів
+    sections - вже зібрані розділи (спільні для кількох питань)
+    """
+    if not include_context:
+        return ""
+    
+    sections = dict(sections) if sections is not None else await build_context_sections(db)
+    
+    # 3. НАЙРЕЛЕВАНТНІШІ РЯДКИ З ЛОКАЛЬНОГО ІНДЕКСУ (всі рядки Excel та записи БД)
+    hits = await run_in_threadpool(retrieval_index.search, db, message)
+    sections["retrieved"] = format_retrieved(hits)
+    
+    context, _ = assemble_context(message, sections)
+    return f"{context}\n\n" if context else ""
+
+
+def conversation_memory(request: ChatRequest, db: Session) -> str:
+    """Попередня розмова для промпту: підсумок та останні повідомлення"""
+    return chat_memory.get_memory_context(db, request.conversation_id) if request.conversation_id else ""
+
+
+async def build_chat_prompt(
+    request: ChatRequest,
+    db: Session,
+    sections: Optional[dict] = None,
+    memory: Optional[str] = None
+) -> str:
+    """
+    Повний промпт: системна інструкція, контекст даних, попередня розмова та питання
+    memory - вже прочитана пам'ять розмови (conversation_memory)
+    """
+    context = await build_chat_context(request.message, request.include_context, db, sections)
+    if memory is None:
+        memory = conversation_memory(request, db)
+    
+    return f"{SYSTEM_PROMPT}\n\n{context}{memory}Питання користувача: {request.message}"
+
+
+# Інструкція для режиму з інструментами
+TOOLS_PROMPT = """Для точних даних викликай інструменти: search_sow (історія свиноматки),
+get_weekly_records (тижневі записи за період), get_statistics_summary (зведена статистика),
+search_records (пошук рядків і приміток за текстом), get_planned_farrowings (планові опороси
+та корм). Не вигадуй дані, яких не отримав з інструментів."""
+
+
+def uses_tools(request: ChatRequest) -> bool:
+    """Чи відповідати через інструменти (запит або CHAT_USE_TOOLS)"""
+    return CHAT_USE_TOOLS if request.use_tools is None else request.use_tools
+
+
+async def chat_with_tools(request: ChatRequest, db: Session, provider: LLMProvider, run, memory: str = "") -> str:
+    """
+    Відповідь моделі з викликами інструментів
+    
+    Промпт містить лише короткий контекст, а потрібні дані модель запитує
+    сама. Інструменти виконуються локально, максимум MAX_TOOL_ROUNDS раундів.
+    run - виклик upstream з запобіжником і спільним бюджетом часу (call_upstream),
+    memory - пам'ять розмови (conversation_memory).
+    """
+    data_version = get_data_version(db)
+    
+    # Короткий контекст: лише підсумок свиноматок у БД та правила
+    context = ""
+    if request.include_context:
+        from backend.excel_reader import excel_reader
+        sections = build_db_context_sections(db)
+        context = f"{sections['db_sows']}\n{excel_reader.rules_text()}\n\n"
+    
+    prompt = f"{SYSTEM_PROMPT}\n{TOOLS_PROMPT}\n\n{context}{memory}Питання користувача: {request.message}"
+    
+    async def execute(name: str, args: dict) -> dict:
+        return await run_in_threadpool(execute_tool, name, args, db, data_version)
+    
+    try:
+        return await provider.generate_with_tools(prompt, execute, MAX_TOOL_ROUNDS, run=run)
+    except ToolRoundsExceeded as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+async def remember_chat_turn(request: ChatRequest, answer: str, write_db: Optional[Session]):
+    """Збереження питання та відповіді в пам'яті розмови"""
+    if request.conversation_id and write_db is not None:
+        await run_in_threadpool(
+            chat_memory.remember_turn,
+            write_db.get_bind(),
+            request.conversation_id,
+            request.message,
+            answer
+        )
+
+
+def get_data_version(db: Session) -> str:
+    """
+    Поточна версія даних: база ферми, останній курсор журналу змін
+    та версія Excel файлів
+    """
+    from backend.excel_reader import excel_reader
+    
+    db_version = db.query(func.max(ChangeLog.id)).scalar() or 0
+    return f"{db.get_bind().url}#{db_version}#{excel_reader.data_version()}"
+
+
+def chat_cache_key(request: ChatRequest, db: Session, memory: str = "") -> tuple:
+    """
+    Ключ кешу відповіді: питання, include_context, версія даних та відбиток
+    пам'яті розмови (memory) - відповідь у розмові залежить від її історії
+    """
+    memory_digest = hashlib.sha1(memory.encode("utf-8")).hexdigest()[:16] if memory else ""
+    return (
+        normalize_message(request.message),
+        request.include_context,
+        uses_tools(request),
+        get_data_version(db),
+        memory_digest,
+    )
+
+
+class UpstreamFailure(Exception):
+    """AI недоступний: запобіжник розімкнено, таймаут або помилка upstream"""
+
+
+async def call_upstream(make_call, deadline: float):
+    """
+    Виклик AI через запобіжник та обмежувач
+    
+    Таймаут виклику - AI_REQUEST_TIMEOUT, але не більше залишку бюджету
+    відповіді (deadline), тож кілька раундів інструментів не перевищать його.
+    Таймаути та помилки upstream рахуються запобіжником і стають UpstreamFailure.
+    """
+    if not ai_breaker.allow_request():
+        raise UpstreamFailure("запобіжник розімкнено")
+    
+    timeout = min(AI_REQUEST_TIMEOUT, deadline - asyncio.get_running_loop().time())
+    if timeout <= 0:
+        ai_breaker.release()
+        raise UpstreamFailure("бюджет часу відповіді вичерпано")
+    
+    try:
+        result = await ai_limiter.run(make_call, timeout)
+    except HTTPException as e:
+        if e.status_code != 504:
+            ai_breaker.release()  # Переповнена черга - не вина upstream
+            raise
+        ai_breaker.record_failure()
+        raise UpstreamFailure(e.detail)
+    except Exception as e:
+        ai_breaker.record_failure()
+        raise UpstreamFailure(str(e))
+    
+    ai_breaker.record_success()
+    return result
+
+
+# Локальна довідка не довша за цей час, інакше - статичне повідомлення, секунд
+DEGRADED_ANSWER_TIMEOUT = float(os.getenv("DEGRADED_ANSWER_TIMEOUT", "2"))
+DEGRADED_UNAVAILABLE = "⚠️ AI асистент тимчасово недоступний. Спробуйте пізніше."
+
+
+def build_degraded_answer(message: str, bind) -> str:
+    """
+    Локальна довідка без AI: поголів'я в БД, зведена статистика (лише з кешу
+    інструментів) та знайдені за питанням записи (лише вже проіндексовані)
+    
+    Excel тут не читається, тож під час збою AI цей шлях лишається швидким.
+    Власна сесія: після таймауту потік може завершуватись уже без запиту.
+    """
+    db = Session(bind=bind)
+    try:
+        return _degraded_answer_text(message, db)
+    finally:
+        db.close()
+
+
+def _degraded_answer_text(message: str, db: Session) -> str:
+    summary = cached_tool_result("get_statistics_summary", {}, get_data_version(db)) or {}
+    farm_data = summary.get("farm_data") or {}
+    sows_data = summary.get("sows_data") or {}
+    
+    lines = ["⚠️ AI асистент тимчасово недоступний. Коротка довідка з даних ферми (без аналізу):"]
+    
+    total_sows = db.query(Sow).count()
+    active_sows = db.query(Sow).filter(Sow.status == "активна").count()
+    lines.append(f"- Свиноматок у БД: {total_sows} (активних: {active_sows})")
+    
+    if farm_data:
+        lines.append(f"- Тижнів в обліку: {farm_data.get('total_weeks', 0)}")
+        lines.append(f"- Осіменінь: {farm_data.get('total_inseminations', 0)}")
+        lines.append(f"- Середній % перегулу: {farm_data.get('avg_regustation_percent', 0)}%")
+    if sows_data:
+        lines.append(f"- Унікальних свиноматок в обліку: {sows_data.get('unique_sows', 0)}")
+        lines.append(f"- Позитивних тестів на 28 день: {sows_data.get('positive_pregnancy_tests', 0)}")
+    
+    hits = retrieval_index.search(db, message, 3, build_excel=False)
+    if hits:
+        lines.append("\nЗаписи за вашим питанням:")
+        lines.extend(f"- [{hit['source']}] {hit['text']}" for hit in hits)
+    
+    return "\n".join(lines)
+
+
+async def degraded_chat_answer(request: ChatRequest, db: Session, reason: str) -> dict:
+    """Відповідь чату без AI (не кешується і не зберігається в пам'яті розмови)"""
+    try:
+        text = await asyncio.wait_for(
+            run_in_threadpool(build_degraded_answer, request.message, db.get_bind()),
+            DEGRADED_ANSWER_TIMEOUT
+        )
+    except Exception:
+        text = DEGRADED_UNAVAILABLE  # Довідка надто повільна або БД недоступна
+    return {
+        "response": text,
+        "timestamp": datetime.utcnow().isoformat(),
+        "cached": False,
+        "degraded": True,
+        "reason": reason
+    }
+
+
+async def chat_with_ai(request: ChatRequest, db: Session, write_db: Optional[Session] = None) -> dict:
+    """
+    Чат з AI асистентом (з даними з БД та Excel файлів)
+    write_db потрібна для збереження розмови, якщо вказано conversation_id
+    """
+    provider = get_available_provider()
+    
+    try:
+        # Повторне питання при незмінних даних і тій самій пам'яті розмови - відповідь з кешу
+        memory = conversation_memory(request, db)
+        cache_key = chat_cache_key(request, db, memory)
+        cached = chat_cache.get(cache_key)
+        if cached is not None:
+            await remember_chat_turn(request, cached["response"], write_db)
+            return {**cached, "cached": True}
         
-        # Генерація відповіді
-        full_prompt = f"{system_prompt}\n\n{context}Питання користувача: {request.message}"
+        # Запобіжник розімкнено - одразу локальна довідка, без збирання контексту
+        if ai_breaker.is_open:
+            return await degraded_chat_answer(request, db, "запобіжник розімкнено")
         
-        response = model.generate_content(full_prompt)
+        bind = db.get_bind()
         
-        return {
-            "response": response.text,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        async def answer_question() -> dict:
+            # Спільний бюджет часу на всі виклики AI цієї відповіді
+            deadline = asyncio.get_running_loop().time() + AI_LATENCY_BUDGET
+            
+            def run(make_call):
+                return call_upstream(make_call, deadline)
+            
+            # Спільне обчислення може пережити запит-ініціатор (скасування, відключення),
+            # сесію якого FastAPI вже закриє - тому власна сесія бази ферми
+            shared_db = Session(bind=bind)
+            try:
+                if uses_tools(request):
+                    answer = await chat_with_tools(request, shared_db, provider, run, memory)
+                else:
+                    full_prompt = await build_chat_prompt(request, shared_db, memory=memory)
+                    answer = await run(lambda: provider.generate(full_prompt))
+            finally:
+                shared_db.close()
+            
+            result = {
+                "response": answer,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            chat_cache.set(cache_key, result)
+            return result
+        
+        # Однакові одночасні питання (ті самі база ферми, дані та пам'ять) - один виклик AI на всіх
+        try:
+            result = await single_flight.do(("chat",) + cache_key, answer_question)
+        except UpstreamFailure as e:
+            return await degraded_chat_answer(request, db, str(e))
+        
+        await remember_chat_turn(request, result["response"], write_db)
         
+        return {**result, "cached": False}
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Помилка AI: {str(e)}"
         )
+
+
+# Одночасних викликів AI для пакету питань
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "3"))
+
+
+async def chat_batch_with_ai(request: ChatBatchRequest, db: Session) -> dict:
+    """
+    Відповіді на пакет питань зі спільним контекстом
+    
+    Розділи БД та Excel збираються один раз для всіх питань, промпти готуються
+    послідовно (одна сесія БД), а виклики AI виконуються паралельно, не більше
+    CHAT_BATCH_CONCURRENCY одночасно. Інструменти в пакеті не використовуються.
+    """
+    provider = get_available_provider()
+    
+    questions = [question.strip() for question in request.questions]
+    if not all(questions):
+        raise HTTPException(status_code=400, detail="Питання не може бути порожнім")
+    
+    chat_requests = [
+        ChatRequest(message=question, include_context=request.include_context, use_tools=False)
+        for question in questions
+    ]
+    answers: List[Optional[dict]] = [None] * len(chat_requests)
+    prompts = {}
+    
+    try:
+        # Спільний контекст - один раз на пакет (не потрібен, якщо запобіжник розімкнено)
+        sections = None
+        if request.include_context and not ai_breaker.is_open:
+            sections = await build_context_sections(db)
+        
+        for index, chat_request in enumerate(chat_requests):
+            cache_key = chat_cache_key(chat_request, db)
+            cached = chat_cache.get(cache_key)
+            if cached is not None:
+                answers[index] = {**cached, "cached": True}
+            elif not ai_breaker.is_open:
+                prompts[index] = (cache_key, await build_chat_prompt(chat_request, db, sections))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Помилка формування контексту: {str(e)}"
+        )
+    
+    semaphore = asyncio.Semaphore(CHAT_BATCH_CONCURRENCY)
+    
+    async def answer(index: int, cache_key: tuple, prompt: str):
+        async def answer_question() -> dict:
+            async with semaphore:
+                deadline = asyncio.get_running_loop().time() + AI_LATENCY_BUDGET
+                text = await call_upstream(lambda: provider.generate(prompt), deadline)
+            result = {"response": text, "timestamp": datetime.utcnow().isoformat()}
+            chat_cache.set(cache_key, result)
+            return result
+        
+        # Однакові питання в пакеті (та в інших запитах) - один виклик AI
+        try:
+            result = await single_flight.do(("chat",) + cache_key, answer_question)
+            answers[index] = {**result, "cached": False}
+        except UpstreamFailure as e:
+            answers[index] = {"degraded_reason": str(e)}
+        except HTTPException as e:
+            answers[index] = {"error": e.detail, "status": e.status_code}
+    
+    await asyncio.gather(*(answer(index, *prompts[index]) for index in prompts))
+    
+    # AI недоступний - локальні довідки (послідовно, бо використовують сесію БД)
+    for index, chat_request in enumerate(chat_requests):
+        if answers[index] is None or "degraded_reason" in answers[index]:
+            reason = answers[index]["degraded_reason"] if answers[index] else "запобіжник розімкнено"
+            answers[index] = await degraded_chat_answer(chat_request, db, reason)
+    
+    return {
+        "answers": [
+            {"question": question, **result}
+            for question, result in zip(questions, answers)
+        ],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Форматування події Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+STREAM_DISCONNECT_POLL = 1.0  # Як часто перевіряти відключення клієнта під час очікування фрагмента, секунд
+STREAM_END = object()  # Потік провайдера завершено
+CLIENT_GONE = object()  # Клієнт відключився
+
+
+async def next_stream_chunk(chunks, deadline: float, is_disconnected):
+    """
+    Наступний фрагмент потоку провайдера до дедлайну
+
+    Поки upstream мовчить, періодично перевіряється відключення клієнта, щоб
+    не тримати місце в черзі AI до AI_STREAM_TIMEOUT.
+
+    Returns:
+        Текст фрагмента, STREAM_END або CLIENT_GONE
+    Raises:
+        asyncio.TimeoutError: дедлайн минув
+    """
+    loop = asyncio.get_running_loop()
+    pending = asyncio.ensure_future(chunks.__anext__())
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            
+            done, _ = await asyncio.wait({pending}, timeout=min(STREAM_DISCONNECT_POLL, remaining))
+            if done:
+                try:
+                    return pending.result()
+                except StopAsyncIteration:
+                    return STREAM_END
+            if await is_disconnected():
+                return CLIENT_GONE
+    finally:
+        if not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+
+
+async def stream_chat_with_ai(
+    request: ChatRequest,
+    db: Session,
+    is_disconnected,
+    write_db: Optional[Session] = None
+) -> StreamingResponse:
+    """
+    Чат з AI з потоковою відповіддю (Server-Sent Events)
+    
+    Події: token (фрагмент тексту), done (метадані), error (помилка).
+    Якщо AI недоступний до першого токена - локальна довідка (done.degraded).
+    Генерація зупиняється, якщо клієнт відключився.
+    Інструменти (use_tools) в потоковому режимі не використовуються.
+    """
+    provider = get_available_provider()
+    
+    # Контекст збирається до початку потоку, тож помилки повертаються звичайним HTTP статусом
+    try:
+        memory = conversation_memory(request, db)
+        cache_key = chat_cache_key(request, db, memory)
+        cached = chat_cache.get(cache_key)
+        # При розімкненому запобіжнику контекст не потрібен - буде локальна довідка
+        skip_prompt = cached is not None or ai_breaker.is_open
+        full_prompt = None if skip_prompt else await build_chat_prompt(request, db, memory=memory)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Помилка формування контексту: {str(e)}"
+        )
+    
+    async def events():
+        if cached is not None:
+            # Відповідь з кешу - одним фрагментом
+            await remember_chat_turn(request, cached["response"], write_db)
+            yield _sse_event("token", {"text": cached["response"]})
+            yield _sse_event("done", {
+                "timestamp": cached["timestamp"],
+                "chars": len(cached["response"]),
+                "first_token_ms": 0,
+                "total_ms": 0,
+                "cached": True
+            })
+            return
+        
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + AI_STREAM_TIMEOUT
+        first_token_ms = None
+        total_chars = 0
+        parts = []
+        
+        async def degraded(reason: str):
+            # Локальна довідка одним фрагментом, якщо AI недоступний до першого токена
+            answer = await degraded_chat_answer(request, db, reason)
+            yield _sse_event("token", {"text": answer["response"]})
+            yield _sse_event("done", {
+                "timestamp": answer["timestamp"],
+                "chars": len(answer["response"]),
+                "first_token_ms": None,
+                "total_ms": round((loop.time() - started) * 1000),
+                "cached": False,
+                "degraded": True
+            })
+        
+        if full_prompt is None or not ai_breaker.allow_request():
+            async for event in degraded("запобіжник розімкнено"):
+                yield event
+            return
+        
+        # Дозволений запит (зокрема пробний) має повідомити запобіжнику результат,
+        # навіть якщо клієнт відключився і генератор скасовано
+        reported = False
+        failure = None
+        try:
+            try:
+                async with ai_limiter.slot(deadline):
+                    chunks = provider.stream(full_prompt).__aiter__()
+                    try:
+                        while True:
+                            text = await next_stream_chunk(chunks, deadline, is_disconnected)
+                            if text is STREAM_END:
+                                break
+                            if text is CLIENT_GONE:
+                                return
+                            
+                            if first_token_ms is None:
+                                first_token_ms = round((loop.time() - started) * 1000)
+                            total_chars += len(text)
+                            parts.append(text)
+                            yield _sse_event("token", {"text": text})
+                    finally:
+                        # Закриття потоку провайдера (і upstream з'єднання) за будь-якого виходу
+                        await chunks.aclose()
+                
+                ai_breaker.record_success()
+                reported = True
+            
+            except HTTPException as e:
+                ai_breaker.release()  # Переповнена черга - не вина upstream
+                reported = True
+                yield _sse_event("error", {"status": e.status_code, "detail": e.detail})
+                return
+            except asyncio.TimeoutError:
+                failure = (504, f"AI не відповів за {AI_STREAM_TIMEOUT:.0f} с")
+            except Exception as e:
+                failure = (500, f"Помилка AI: {str(e)}")
+            
+            if failure:
+                ai_breaker.record_failure()
+                reported = True
+                if first_token_ms is None:
+                    async for event in degraded(failure[1]):
+                        yield event
+                else:
+                    yield _sse_event("error", {"status": failure[0], "detail": failure[1]})
+                return
+        finally:
+            if not reported:
+                ai_breaker.release()  # Відключення клієнта або скасування - результат невідомий
+        
+        try:
+            timestamp = datetime.utcnow().isoformat()
+            chat_cache.set(cache_key, {"response": "".join(parts), "timestamp": timestamp})
+            await remember_chat_turn(request, "".join(parts), write_db)
+            yield _sse_event("done", {
+                "timestamp": timestamp,
+                "chars": total_chars,
+                "first_token_ms": first_token_ms,
+                "total_ms": round((loop.time() - started) * 1000),
+                "cached": False
+            })
+        except Exception as e:
+            yield _sse_event("error", {"status": 500, "detail": f"Помилка збереження відповіді: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
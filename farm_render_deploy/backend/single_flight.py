@@ -0,0 +1,57 @@
+"""
+Об'єднання однакових одночасних обчислень (single-flight)
+
+На початку зміни багато користувачів одночасно відкривають застосунок, і
+однакові запити контексту чи AI чату приходять разом. Поки обчислення для
+ключа виконується, наступні запити з тим самим ключем чекають на нього і
+отримують той самий результат (або ту саму помилку), замість повторного
+парсингу Excel чи виклику AI.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Одне обчислення на ключ серед одночасних запитів"""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0  # Виконаних обчислень
+        self.coalesced = 0  # Запитів, що отримали чужий результат
+
+    async def do(self, key: Hashable, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Результат make_call() для ключа
+
+        Якщо обчислення з таким ключем уже виконується - очікування на нього.
+        Скасування одного з очікуючих запитів не скасовує спільне обчислення.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.ensure_future(make_call())
+        self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._release(key, done))
+        return await asyncio.shield(future)
+
+    def _release(self, key: Hashable, future: asyncio.Future):
+        """Звільнення ключа після завершення обчислення"""
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    @property
+    def stats(self) -> dict:
+        """Статистика об'єднання"""
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+
+# Глобальний екземпляр
+single_flight = SingleFlight()
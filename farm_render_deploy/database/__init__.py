@@ -1,13 +1,21 @@
 """
 __init__.py для database пакету
 """
-from .models import Base, Sow, WeeklyRecord, get_db, create_tables, SessionLocal
+from .models import Base, Sow, SowEvent, WeeklyRecord, ChangeLog, ChatConversation, ChatMessage, get_db, get_read_db, create_tables, SessionLocal, ReadSessionLocal, engine_registry, resolve_farm_id
 
 __all__ = [
     "Base",
     "Sow", 
+    "SowEvent",
     "WeeklyRecord",
+    "ChangeLog",
+    "ChatConversation",
+    "ChatMessage",
     "get_db",
+    "get_read_db",
     "create_tables",
-    "SessionLocal"
+    "SessionLocal",
+    "ReadSessionLocal",
+    "engine_registry",
+    "resolve_farm_id"
 ]
@@ -3,8 +3,9 @@
 Створює таблиці та додає тестові дані
 """
 
-from models import create_tables, SessionLocal, Sow, WeeklyRecord
+from models import create_tables, engine_registry, SessionLocal, Sow, WeeklyRecord
 from datetime import date, timedelta
+import argparse
 
 
 def add_sample_data():
@@ -61,10 +62,26 @@ def add_sample_data():
         db.close()
 
 
+def provision_farm(farm_id: str):
+    """
+    Створення бази даних нової ферми (файл та таблиці)
+    """
+    engine_registry.provision(farm_id)
+    print(f"✅ Ферму '{farm_id}' створено: {engine_registry.database_url(farm_id)}")
+
+
 def main():
     """
     Головна функція ініціалізації
     """
+    parser = argparse.ArgumentParser(description="Ініціалізація бази даних")
+    parser.add_argument("--farm", help="Створити базу даних ферми з цим ідентифікатором")
+    args = parser.parse_args()
+    
+    if args.farm:
+        provision_farm(args.farm)
+        return
+    
     print("🚀 Ініціалізація бази даних...")
     
     # Створення таблиць
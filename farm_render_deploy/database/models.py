@@ -2,11 +2,17 @@
 Моделі бази даних для системи обліку свиноферми
 """
 
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, create_engine
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, ForeignKey, Index, create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.exc import SQLAlchemyError
+from fastapi import Request, HTTPException
+from collections import OrderedDict
+from datetime import date, datetime
+import json
 import os
+import re
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,17 +20,94 @@ load_dotenv()
 # База для моделей
 Base = declarative_base()
 
+# Версія схеми: збільшувати при кожній зміні моделей,
+# інакше таблиці не будуть створені при старті
+SCHEMA_VERSION = 4
+
 # URL бази даних з .env або за замовчуванням
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./farm.db")
 
+# Мультиферма: кожна ферма має власний файл бази даних
+DEFAULT_FARM_ID = os.getenv("DEFAULT_FARM_ID", "default")
+FARM_ID_HEADER = "X-Farm-ID"
+FARM_DB_DIR = os.getenv("FARM_DB_DIR", "./farms")
+FARM_DATABASE_URL_TEMPLATE = os.getenv(
+    "FARM_DATABASE_URL_TEMPLATE",
+    f"sqlite:///{FARM_DB_DIR}/{{farm_id}}.db"
+)
+FARM_ENGINE_CACHE_SIZE = int(os.getenv("FARM_ENGINE_CACHE_SIZE", "32"))
+FARM_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Дозволені ферми (через кому); інші відкриваються лише якщо їх файл БД уже існує
+FARM_IDS = {farm_id.strip() for farm_id in os.getenv("FARM_IDS", "").split(",") if farm_id.strip()}
+
+
+# Окремий пул для читання (GET запити та контекст AI чату)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")  # Репліка Postgres (необов'язково)
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "10"))
+WRITE_POOL_SIZE = int(os.getenv("WRITE_POOL_SIZE", "5"))
+
+
+def is_sqlite_file(database_url: str) -> bool:
+    """Чи це SQLite база у файлі (не в пам'яті)"""
+    return database_url.startswith("sqlite:///") and ":memory:" not in database_url
+
+
+def read_only_url(database_url: str) -> str:
+    """URL для читання: SQLite відкривається в режимі mode=ro"""
+    if is_sqlite_file(database_url):
+        path = database_url[len("sqlite:///"):]
+        return f"sqlite:///file:{path}?mode=ro&uri=true"
+    return database_url
+
+
+def _enable_wal(dbapi_connection, connection_record):
+    """WAL режим: читачі не блокуються записом"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def make_engine(database_url: str, pool_size: int = WRITE_POOL_SIZE):
+    """Створення двигуна бази даних для вказаного URL"""
+    if "sqlite" in database_url and not is_sqlite_file(database_url):
+        # База в пам'яті - без налаштувань пулу
+        return create_engine(database_url, connect_args={"check_same_thread": False})
+
+    db_engine = create_engine(
+        database_url,
+        connect_args={"check_same_thread": False} if "sqlite" in database_url else {},
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        pool_pre_ping="sqlite" not in database_url
+    )
+    if is_sqlite_file(database_url) and "mode=ro" not in database_url:
+        event.listen(db_engine, "connect", _enable_wal)
+    return db_engine
+
+
+def make_read_engine(database_url: str, write_engine):
+    """
+    Двигун тільки для читання з власним пулом з'єднань (SQLite у режимі mode=ro)
+    Для інших баз - основний двигун: другий пул до того ж сервера не є
+    реплікою і лише подвоює кількість з'єднань (репліка - DATABASE_READ_URL)
+    """
+    url = read_only_url(database_url)
+    if url == database_url:
+        return write_engine
+    return make_engine(url, pool_size=READ_POOL_SIZE)
+
+
 # Створення двигуна бази даних
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+engine = make_engine(DATABASE_URL)
+read_engine = (
+    make_engine(DATABASE_READ_URL, pool_size=READ_POOL_SIZE)
+    if DATABASE_READ_URL else make_read_engine(DATABASE_URL, engine)
 )
 
 # Сесія для роботи з БД
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 
 class Sow(Base):
@@ -32,6 +115,7 @@ class Sow(Base):
     Модель свиноматки
     """
     __tablename__ = "sows"
+    __change_entity__ = "sow"  # Ім'я сутності в журналі змін
     
     id = Column(Integer, primary_key=True, index=True)
     number = Column(String(50), unique=True, nullable=False, index=True)  # Номер свиноматки
@@ -41,6 +125,14 @@ class Sow(Base):
     created_at = Column(DateTime, default=datetime.utcnow)  # Дата створення запису
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Дата оновлення
 
+    # Історія подій (осіменіння, тести, опороси)
+    events = relationship(
+        "SowEvent",
+        back_populates="sow",
+        cascade="all, delete-orphan",
+        order_by="SowEvent.event_date"
+    )
+
     def to_dict(self):
         """Перетворення об'єкта в словник"""
         return {
@@ -59,6 +151,7 @@ class WeeklyRecord(Base):
     Модель тижневого обліку опоросів
     """
     __tablename__ = "weekly_records"
+    __change_entity__ = "weekly_record"  # Ім'я сутності в журналі змін
     
     id = Column(Integer, primary_key=True, index=True)
     week_start_date = Column(Date, nullable=False, unique=True, index=True)  # Дата початку тижня
@@ -93,12 +186,386 @@ class WeeklyRecord(Base):
         }
 
 
-def get_db():
+# Типи подій репродуктивної історії свиноматки
+SOW_EVENT_TYPES = ("осіменіння", "тест_28", "опорос")
+
+
+class SowEvent(Base):
+    """
+    Модель події в історії свиноматки (осіменіння, тест на 28 день, опорос)
+    """
+    __tablename__ = "sow_events"
+    __change_entity__ = "sow_event"  # Ім'я сутності в журналі змін
+    __table_args__ = (
+        # Історія свиноматки: WHERE sow_id = ? ORDER BY event_date
+        Index("ix_sow_events_sow_date", "sow_id", "event_date"),
+        # Події за період: WHERE event_type = ? AND event_date BETWEEN ? AND ?
+        Index("ix_sow_events_type_date", "event_type", "event_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    sow_id = Column(Integer, ForeignKey("sows.id", ondelete="CASCADE"), nullable=False)  # Свиноматка
+    event_type = Column(String(20), nullable=False)  # Тип події: осіменіння, тест_28, опорос
+    event_date = Column(Date, nullable=False, index=True)  # Дата події
+    result = Column(String(50), nullable=True)  # Результат (наприклад "+" / "-" для тесту)
+    notes = Column(Text, nullable=True)  # Примітки
+    created_at = Column(DateTime, default=datetime.utcnow)  # Дата створення запису
+
+    sow = relationship("Sow", back_populates="events")
+
+    def to_dict(self):
+        """Перетворення об'єкта в словник"""
+        return {
+            "id": self.id,
+            "sow_id": self.sow_id,
+            "sow_number": self.sow.number if self.sow else None,
+            "event_type": self.event_type,
+            "event_date": self.event_date.isoformat() if self.event_date else None,
+            "result": self.result,
+            "notes": self.notes,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class ChatConversation(Base):
+    """
+    Розмова з AI асистентом (пам'ять чату)
+    Старі повідомлення стискаються в підсумок summary
+    """
+    __tablename__ = "chat_conversations"
+
+    id = Column(String(64), primary_key=True)  # Ідентифікатор розмови
+    summary = Column(Text, nullable=True)  # Підсумок старих повідомлень
+    summarized_up_to = Column(Integer, default=0)  # id останнього повідомлення в підсумку
+    message_count = Column(Integer, default=0)  # Кількість повідомлень
+    created_at = Column(DateTime, default=datetime.utcnow)  # Дата створення
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Дата оновлення
+
+    def to_dict(self):
+        """Перетворення об'єкта в словник"""
+        return {
+            "id": self.id,
+            "summary": self.summary,
+            "summarized_up_to": self.summarized_up_to,
+            "message_count": self.message_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class ChatMessage(Base):
+    """
+    Повідомлення розмови (тільки додаються, не змінюються)
+    """
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Сторінки розмови: WHERE conversation_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_chat_messages_conversation_id_id", "conversation_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(String(64), ForeignKey("chat_conversations.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(20), nullable=False)  # user або assistant
+    text = Column(Text, nullable=False)  # Текст повідомлення
+    created_at = Column(DateTime, default=datetime.utcnow)  # Час повідомлення
+
+    def to_dict(self):
+        """Перетворення об'єкта в словник"""
+        return {
+            "id": self.id,
+            "conversation_id": self.conversation_id,
+            "role": self.role,
+            "text": self.text,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+class ChangeLog(Base):
+    """
+    Журнал змін для дельта-синхронізації клієнтів
+
+    id монотонно зростає і використовується як курсор. Видалення
+    записуються як tombstone (operation="delete", data=None).
+    """
+    __tablename__ = "change_log"
+    __table_args__ = {"sqlite_autoincrement": True}  # id не перевикористовуються
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(30), nullable=False)  # sow, weekly_record, sow_event
+    entity_id = Column(Integer, nullable=False)  # id запису сутності
+    operation = Column(String(10), nullable=False)  # upsert або delete
+    data = Column(Text, nullable=True)  # JSON знімок запису (для upsert)
+    changed_at = Column(DateTime, default=datetime.utcnow)  # Час зміни
+
+    def to_dict(self):
+        """Перетворення об'єкта в словник"""
+        return {
+            "cursor": self.id,
+            "entity": self.entity,
+            "entity_id": self.entity_id,
+            "operation": self.operation,
+            "data": json.loads(self.data) if self.data else None,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None,
+        }
+
+
+def _change_snapshot(obj) -> str:
+    """JSON знімок колонок запису для журналу змін"""
+    data = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.key)
+        data[column.key] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _change_row(obj, operation: str) -> dict:
+    """Рядок журналу змін для запису"""
+    return {
+        "entity": obj.__change_entity__,
+        "entity_id": obj.id,
+        "operation": operation,
+        "data": _change_snapshot(obj) if operation == "upsert" else None,
+        "changed_at": datetime.utcnow(),
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _record_changes(session, flush_context):
+    """
+    Запис змін у журнал в тій самій транзакції, що й сама зміна
+    (охоплює CRUD, імпорт Excel та каскадні видалення)
+    """
+    rows = []
+    for obj in session.new:
+        if hasattr(obj, "__change_entity__"):
+            rows.append(_change_row(obj, "upsert"))
+    for obj in session.dirty:
+        if hasattr(obj, "__change_entity__") and session.is_modified(obj):
+            rows.append(_change_row(obj, "upsert"))
+    for obj in session.deleted:
+        if hasattr(obj, "__change_entity__"):
+            rows.append(_change_row(obj, "delete"))
+
+    if rows:
+        session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+def backfill_change_log(bind):
+    """
+    Заповнення порожнього журналу змін існуючими записами,
+    щоб перша синхронізація з курсором 0 отримала всі дані
+    """
+    db = Session(bind=bind)
+    try:
+        if db.query(ChangeLog.id).first() is not None:
+            return
+
+        rows = []
+        for model in (Sow, WeeklyRecord, SowEvent):
+            for obj in db.query(model).order_by(model.id):
+                rows.append(_change_row(obj, "upsert"))
+
+        if rows:
+            db.execute(ChangeLog.__table__.insert(), rows)
+            db.commit()
+    finally:
+        db.close()
+
+
+class SchemaMeta(Base):
+    """
+    Збережена версія схеми бази даних
+    """
+    __tablename__ = "schema_meta"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)  # Версія схеми
+    updated_at = Column(DateTime, default=datetime.utcnow)  # Час останнього оновлення схеми
+
+
+def ensure_schema(bind) -> bool:
+    """
+    Створення таблиць лише якщо збережена версія схеми відрізняється
+    від SCHEMA_VERSION
+
+    Returns:
+        True якщо схему було створено/оновлено
     """
-    Отримання сесії бази даних
+    try:
+        with bind.connect() as connection:
+            stored_version = connection.execute(
+                SchemaMeta.__table__.select().with_only_columns(SchemaMeta.version)
+            ).scalar()
+    except SQLAlchemyError:
+        stored_version = None  # Таблиці schema_meta ще немає
+
+    if stored_version == SCHEMA_VERSION:
+        return False
+
+    Base.metadata.create_all(bind=bind)
+    backfill_change_log(bind)
+
+    with bind.begin() as connection:
+        connection.execute(SchemaMeta.__table__.delete())
+        connection.execute(
+            SchemaMeta.__table__.insert(),
+            {"id": 1, "version": SCHEMA_VERSION, "updated_at": datetime.utcnow()}
+        )
+    return True
+
+
+class EngineRegistry:
+    """
+    LRU реєстр двигунів та фабрик сесій по фермах
+
+    Ферма за замовчуванням використовує DATABASE_URL, решта ферм отримують
+    власний файл бази даних. Відкриваються лише створені ферми (FARM_IDS
+    або наявний файл БД); нова ферма створюється явно через provision
+    (python init_db.py --farm <id>). Найдавніше використані двигуни
+    закриваються при переповненні реєстру.
+    Кожна ферма має пару двигунів: для запису та для читання.
+    Схема ферми перевіряється під блокуванням лише цієї ферми, тож перше
+    звернення до однієї ферми не затримує звернення до інших.
+    """
+
+    def __init__(self, max_size: int = FARM_ENGINE_CACHE_SIZE):
+        self.max_size = max(1, max_size)
+        self._entries = OrderedDict()  # farm_id -> (write_engine, read_engine, sessionmaker, read_sessionmaker)
+        self._farm_locks = {}  # farm_id -> блокування відкриття ферми
+        self._lock = threading.Lock()
+
+    def database_url(self, farm_id: str) -> str:
+        """URL бази даних ферми"""
+        if farm_id == DEFAULT_FARM_ID:
+            return DATABASE_URL
+        return FARM_DATABASE_URL_TEMPLATE.format(farm_id=farm_id)
+
+    def is_provisioned(self, farm_id: str) -> bool:
+        """Чи створена ферма: за замовчуванням, у FARM_IDS або файл БД уже існує"""
+        if farm_id == DEFAULT_FARM_ID or farm_id in FARM_IDS or farm_id in self._entries:
+            return True
+        database_url = self.database_url(farm_id)
+        return is_sqlite_file(database_url) and os.path.exists(database_url[len("sqlite:///"):])
+
+    def provision(self, farm_id: str):
+        """Явне створення ферми: файл БД та таблиці"""
+        if not FARM_ID_PATTERN.match(farm_id):
+            raise ValueError(f"Невірний ідентифікатор ферми: {farm_id}")
+        return self.get_sessionmaker(farm_id, create=True)
+
+    def get_sessionmaker(self, farm_id: str, read_only: bool = False, create: bool = False):
+        """
+        Фабрика сесій для ферми (двигуни створюються ліниво)
+        Для нествореної ферми без create - LookupError
+        """
+        if farm_id == DEFAULT_FARM_ID:
+            return ReadSessionLocal if read_only else SessionLocal
+
+        entry = self._cached(farm_id)
+        if entry is None:
+            if not create and not self.is_provisioned(farm_id):
+                raise LookupError(f"Ферму '{farm_id}' не знайдено")
+            entry = self._open(farm_id)
+        return entry[3] if read_only else entry[2]
+
+    def _cached(self, farm_id: str):
+        """Відкрита ферма (позначається як нещодавно використана) або None"""
+        with self._lock:
+            entry = self._entries.get(farm_id)
+            if entry is not None:
+                self._entries.move_to_end(farm_id)
+            return entry
+
+    def _open(self, farm_id: str):
+        """
+        Відкриття ферми: двигуни та перевірка схеми (міграція може бути довгою)
+        Глобальне блокування тримається лише для роботи зі словниками
+        """
+        with self._lock:
+            farm_lock = self._farm_locks.setdefault(farm_id, threading.Lock())
+
+        with farm_lock:
+            entry = self._cached(farm_id)
+            if entry is not None:
+                return entry  # Відкрито паралельним запитом
+
+            database_url = self.database_url(farm_id)
+            if is_sqlite_file(database_url):
+                os.makedirs(os.path.dirname(database_url[len("sqlite:///"):]) or ".", exist_ok=True)
+
+            farm_engine = make_engine(database_url)
+            ensure_schema(farm_engine)
+            farm_read_engine = make_read_engine(database_url, farm_engine)
+            entry = (
+                farm_engine,
+                farm_read_engine,
+                sessionmaker(autocommit=False, autoflush=False, bind=farm_engine),
+                sessionmaker(autocommit=False, autoflush=False, bind=farm_read_engine),
+            )
+
+            with self._lock:
+                self._entries[farm_id] = entry
+                # Витіснення найдавніше використаних двигунів
+                evicted = []
+                while len(self._entries) > self.max_size:
+                    evicted.append(self._entries.popitem(last=False)[1])
+
+        for old_entry in evicted:
+            self._dispose(old_entry)
+        return entry
+
+    @staticmethod
+    def _dispose(entry):
+        """Закрити двигуни запису та читання ферми"""
+        entry[0].dispose()
+        if entry[1] is not entry[0]:
+            entry[1].dispose()
+
+    def dispose_all(self):
+        """Закрити всі двигуни ферм"""
+        with self._lock:
+            for entry in self._entries.values():
+                self._dispose(entry)
+            self._entries.clear()
+
+
+# Глобальний реєстр двигунів ферм
+engine_registry = EngineRegistry()
+
+
+def resolve_farm_id(request: Request) -> str:
+    """
+    Визначення ферми запиту: префікс шляху /farms/{farm_id}/...
+    (встановлюється middleware) або заголовок X-Farm-ID
+    """
+    farm_id = getattr(request.state, "farm_id", None) or request.headers.get(FARM_ID_HEADER)
+    if not farm_id:
+        return DEFAULT_FARM_ID
+    if not FARM_ID_PATTERN.match(farm_id):
+        raise HTTPException(status_code=400, detail=f"Невірний ідентифікатор ферми: {farm_id}")
+    if not engine_registry.is_provisioned(farm_id):
+        raise HTTPException(status_code=404, detail=f"Ферму '{farm_id}' не знайдено")
+    return farm_id
+
+
+def get_db(request: Request):
+    """
+    Отримання сесії бази даних ферми поточного запиту
     Використовується як dependency в FastAPI
     """
-    db = SessionLocal()
+    db = engine_registry.get_sessionmaker(resolve_farm_id(request))()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request):
+    """
+    Сесія тільки для читання (окремий пул з'єднань)
+    Використовується як dependency в FastAPI для GET запитів
+    """
+    db = engine_registry.get_sessionmaker(resolve_farm_id(request), read_only=True)()
     try:
         yield db
     finally:
@@ -108,6 +575,9 @@ def get_db():
 def create_tables():
     """
     Створення всіх таблиць в базі даних
+    Пропускається, якщо збережена версія схеми актуальна
     """
-    Base.metadata.create_all(bind=engine)
-    print("✅ Таблиці бази даних створено успішно!")
+    if ensure_schema(engine):
+        print(f"✅ Таблиці бази даних створено успішно! (схема v{SCHEMA_VERSION})")
+    else:
+        print(f"✅ Схема бази даних актуальна (v{SCHEMA_VERSION})")
@@ -0,0 +1,17 @@
+"""
+Спільні налаштування тестів: шляхи імпорту backend та тимчасова база даних
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+# База даних тестів - у тимчасовому каталозі (до імпорту database.models)
+TEST_DIR = tempfile.mkdtemp(prefix="farm_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DIR}/farm.db")
+os.environ.setdefault("FARM_DB_DIR", os.path.join(TEST_DIR, "farms"))
+os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(TEST_DIR, "reports"))
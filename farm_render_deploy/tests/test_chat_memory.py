@@ -0,0 +1,51 @@
+"""
+Тести пам'яті чату: одночасне створення розмови
+"""
+
+import threading
+
+from sqlalchemy.orm import Session
+
+from backend import chat_memory
+from database.models import Base, ChatConversation, ChatMessage, make_engine
+
+
+def test_concurrent_create_same_conversation(tmp_path, monkeypatch):
+    """Дві сесії не знаходять розмову, обидві створюють її - обидва повідомлення зберігаються"""
+    engine = make_engine(f"sqlite:///{tmp_path}/chat.db")
+    Base.metadata.create_all(engine)
+
+    # Обидві сесії спершу не знаходять розмову, і лише потім вставляють її
+    barrier = threading.Barrier(2, timeout=10)
+    first_lookup = threading.local()
+    find = chat_memory._find_conversation
+
+    def find_then_wait(db, conversation_id):
+        conversation = find(db, conversation_id)
+        if not getattr(first_lookup, "done", False):
+            first_lookup.done = True
+            barrier.wait()
+        return conversation
+
+    monkeypatch.setattr(chat_memory, "_find_conversation", find_then_wait)
+
+    errors = []
+
+    def remember(text):
+        try:
+            chat_memory.remember_turn(engine, "shared", text, "відповідь")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=remember, args=(f"питання {i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with Session(bind=engine) as db:
+        assert db.query(ChatConversation).count() == 1
+        assert db.query(ChatConversation).one().message_count == 4
+        assert db.query(ChatMessage).filter(ChatMessage.conversation_id == "shared").count() == 4
+    engine.dispose()
@@ -0,0 +1,45 @@
+"""
+Тести /api/table: курсори сторінок та фільтри
+"""
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import excel_table
+from backend.excel_table import SheetSnapshot, encode_cursor
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Клієнт API з одним аркушем у кеші розібраних файлів"""
+    from main import app
+
+    sheets = {"Аркуш": SheetSnapshot(pd.DataFrame({"Номер": range(10)}))}
+    monkeypatch.setattr(excel_table.workbook_snapshots, "get", lambda reader, path: ("v1", sheets))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_next_cursor_returns_next_page(client):
+    first = client.get("/api/table", params={"limit": 4}).json()
+    second = client.get("/api/table", params={"limit": 4, "cursor": first["next_cursor"]})
+    assert second.status_code == 200
+    assert second.json()["offset"] == 4
+
+
+def test_negative_cursor_offset_is_rejected(client):
+    response = client.get("/api/table", params={"cursor": encode_cursor("any", -5)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Невірний курсор"
+
+
+def test_malformed_cursor_is_rejected(client):
+    response = client.get("/api/table", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_filter_query_parameter(client):
+    response = client.get("/api/table", params={"filter": ["Номер:ge:7", "Номер:ne:8"]})
+    assert response.status_code == 200
+    assert response.json()["rows"] == [[7], [9]]
@@ -0,0 +1,145 @@
+"""
+Спільний HTTP клієнт frontend для звернень до Backend API
+
+Один пул з'єднань на процес: keep-alive та HTTP/2 (якщо встановлено h2),
+тож кліки в інтерфейсі не платять за новий TCP/TLS handshake. Таймаути
+залежать від ендпоінту, а клієнт закривається при зупинці додатку.
+
+API_TRANSPORT=local вмикає вбудований транспорт (frontend/local_transport.py)
+для розгортання frontend і backend на одному сервері.
+"""
+
+import contextlib
+import importlib.util
+import json
+import os
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+# URL Backend API
+API_URL = os.getenv("API_URL", "https://farm-ai-chat.fly.dev/api")
+
+# Транспорт: http - запити до API_URL, local - виклик функцій backend у процесі
+API_TRANSPORT = os.getenv("API_TRANSPORT", "http")
+
+# Пул з'єднань
+POOL_LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=60.0,
+)
+
+# HTTP/2 потребує пакета h2 (httpx[http2]); без нього - HTTP/1.1 з keep-alive
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+# Таймаути за замовчуванням та для окремих ендпоінтів (префікс шляху)
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+ENDPOINT_TIMEOUTS: Dict[str, httpx.Timeout] = {
+    "/chat": httpx.Timeout(60.0, connect=5.0),  # Відповідь AI (бюджет бекенду 45 с)
+    # Потік: обмежується лише пауза між фрагментами, не вся відповідь
+    "/chat/stream": httpx.Timeout(10.0, connect=5.0, read=120.0),
+    "/upload-excel": httpx.Timeout(120.0, connect=5.0),
+    "/import-excel": httpx.Timeout(120.0, connect=5.0),
+    "/report": httpx.Timeout(120.0, connect=5.0),
+}
+
+
+def timeout_for(path: str) -> httpx.Timeout:
+    """Таймаут для шляху (найдовший збіг префікса)"""
+    matches = [prefix for prefix in ENDPOINT_TIMEOUTS if path.startswith(prefix)]
+    return ENDPOINT_TIMEOUTS[max(matches, key=len)] if matches else DEFAULT_TIMEOUT
+
+
+class ApiClient:
+    """Ліниво створюваний спільний httpx.AsyncClient"""
+
+    def __init__(self, base_url: str = API_URL, transport: str = API_TRANSPORT):
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+        self.local = None
+        if transport == "local":
+            from frontend.local_transport import LocalTransport
+            self.local = LocalTransport()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Клієнт з пулом з'єднань (створюється при першому зверненні)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2_ENABLED,
+                limits=POOL_LIMITS,
+                timeout=DEFAULT_TIMEOUT,
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Запит до API з таймаутом ендпоінту (якщо не вказано інший)"""
+        if self.local is not None:
+            handler, found = self.local.match(method, path)
+            if handler is not None:
+                return await self.local.request(handler, found, kwargs.get("params"), kwargs.get("json"))
+
+        kwargs.setdefault("timeout", timeout_for(path))
+        return await self.client.request(method, path, **kwargs)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs):
+        """Потокова відповідь API (тіло читається частинами)"""
+        if self.local is not None:
+            handler, found = self.local.match(method, path, stream=True)
+            if handler is not None:
+                async with self.local.stream(handler, found, kwargs.get("params"), kwargs.get("json")) as response:
+                    yield response
+                return
+
+        kwargs.setdefault("timeout", timeout_for(path))
+        async with self.client.stream(method, path, **kwargs) as response:
+            yield response
+
+    async def aclose(self):
+        """Закрити пул з'єднань"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self):
+        """Lifespan задача Reflex: підготовка вбудованого транспорту при старті, закриття клієнта при зупинці"""
+        if self.local is not None:
+            await self.local.startup()
+        try:
+            yield
+        finally:
+            await self.aclose()
+
+
+async def sse_events(response: httpx.Response) -> AsyncIterator[Tuple[str, dict]]:
+    """Події Server-Sent Events з потокової відповіді: (назва, дані)"""
+    event, data = "message", []
+    async for line in response.aiter_lines():
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+# Глобальний клієнт для FarmState
+api_client = ApiClient()
@@ -4,11 +4,109 @@ Frontend додаток на Reflex для системи обліку свин
 
 import reflex as rx
 from typing import List, Dict
-import httpx
 from datetime import datetime, date
+import asyncio
+import time
+import uuid
 
-# URL Backend API
-API_URL = "https://farm-ai-chat.fly.dev/api"
+from frontend.api_client import api_client, sse_events
+
+# Дані сторінок: сторінка -> (шлях API, змінна даних, змінна завантаження, текст помилки)
+# Таблиця та пам'ять (змінна None) завантажуються посторінково - див. _set_table_page, _set_memory_page
+PAGE_DATA = {
+    "weekly": ("/weekly-records", "weekly_records", "loading_weekly", "Помилка завантаження"),
+    "sows": ("/sows", "sows", "loading_sows", "Помилка завантаження"),
+    "table": ("/table", None, "loading_table", "Помилка таблиці"),
+    "memory": ("/memory", None, "loading_memory", "Помилка пам'яті"),
+}
+
+# Мінімальний інтервал між оновленнями стану під час потокової відповіді чату, секунд
+CHAT_STREAM_YIELD_INTERVAL = 0.1
+
+# Cookie з ідентифікатором розмови браузера (повна історія зберігається на сервері, /api/memory)
+CHAT_CONVERSATION_COOKIE = "farm_chat_conversation"
+CHAT_CONVERSATION_MAX_AGE = 365 * 24 * 3600
+
+# Повідомлень чату та пам'яті в стані; старіші завантажуються сторінками з сервера
+CHAT_HISTORY_LIMIT = 50
+
+# Сторінки, що завантажуються заздалегідь разом з поточною
+PREFETCH_PAGES = {
+    "weekly": ["sows", "table"],
+    "sows": ["weekly", "table"],
+    "table": ["weekly", "sows"],
+    "memory": ["weekly"],
+    "report": ["weekly", "sows"],
+}
+
+# Дані, молодші за цей час, показуються без повторного запиту
+DATA_FRESH_SECONDS = 60
+
+# Рядків таблиці Excel на сторінці (у стані зберігається лише поточна сторінка)
+TABLE_PAGE_SIZE = 50
+
+# Оператори фільтрів таблиці (/api/table filter=колонка:оператор:значення)
+TABLE_FILTER_LABELS = {
+    "eq": "=",
+    "ne": "≠",
+    "lt": "<",
+    "le": "≤",
+    "gt": ">",
+    "ge": "≥",
+    "contains": "містить",
+}
+
+# Вирівнювання клітинок за типом колонки
+TYPE_ALIGN = {"number": "right", "date": "center", "boolean": "center", "text": "left"}
+
+
+# Порядок списків як у API: змінна -> (поле сортування, за спаданням)
+LIST_ORDER = {
+    "weekly": ("week_start_date", True),
+    "sows": ("number", False),
+}
+
+
+def temp_id() -> int:
+    """Тимчасовий (від'ємний) id для запису, ще не збереженого на сервері"""
+    return -int(time.time() * 1000)
+
+
+def upsert_item(items: List[Dict], item: Dict, sort_key: str, reverse: bool, replace_id: int = None) -> List[Dict]:
+    """
+    Новий список з доданим або заміненим записом (replace_id - id запису,
+    який замінюється, наприклад тимчасовий), у порядку API
+    """
+    target = item["id"] if replace_id is None else replace_id
+    result = [existing for existing in items if existing["id"] not in (target, item["id"])]
+    result.append(item)
+    result.sort(key=lambda existing: str(existing.get(sort_key) or ""), reverse=reverse)
+    return result
+
+
+def restore_item(items: List[Dict], item_id: int, previous: Dict, sort_key: str, reverse: bool) -> List[Dict]:
+    """Відкат одного запису: попередня версія або видалення (якщо його не було)"""
+    if previous is None:
+        return [existing for existing in items if existing["id"] != item_id]
+    return upsert_item(items, previous, sort_key, reverse, replace_id=item_id)
+
+
+def format_cell(value, column_type: str) -> str:
+    """Текст клітинки таблиці за типом колонки"""
+    if value is None:
+        return ""
+    if column_type == "number" and isinstance(value, (int, float)):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return f"{value:.2f}" if isinstance(value, float) else str(value)
+    if column_type == "date" and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).strftime("%d.%m.%Y")
+        except ValueError:
+            return value
+    if column_type == "boolean":
+        return "✓" if value else "✗"
+    return str(value)
 
 
 class FarmState(rx.State):
@@ -26,17 +124,34 @@ class FarmState(rx.State):
     sows: List[Dict] = []
     loading_sows: bool = False
     
-    # Дані для таблиці Excel
-    table_data: List[Dict] = []
+    # Таблиця Excel: лише поточна сторінка (дані завантажуються з сервера посторінково)
+    table_source: str = "farm"
+    table_sheet: str = ""
+    table_sheets: List[str] = []
+    table_columns: List[Dict[str, str]] = []
+    table_rows: List[List[Dict[str, str]]] = []
+    table_offset: int = 0
+    table_total: int = 0
+    # Запит таблиці (виконується на сервері): сортування ("-" - за спаданням), фільтри, пошук
+    table_sort: List[str] = []
+    table_filters: List[str] = []
+    table_search: str = ""
+    table_filter_column: str = ""
+    table_filter_op: str = "eq"
+    table_filter_value: str = ""
     loading_table: bool = False
-    # Пам'ять AI
+    # Пам'ять AI: одна сторінка розмови (memory_before - id, старіші за який показано; 0 - останні)
     memory: List[Dict] = []
+    memory_before: int = 0
+    memory_has_older: bool = False
     loading_memory: bool = False
     # Завантаження Excel
     show_excel_upload: bool = False
     excel_upload_loading: bool = False
     # Звіт
     report_loading: bool = False
+    # Час завантаження даних сторінок (сторінка -> timestamp)
+    loaded_at: Dict[str, float] = {}
 
     # Форми для створення/редагування
     show_weekly_form: bool = False
@@ -56,8 +171,13 @@ class FarmState(rx.State):
     form_status: str = "активна"
     form_sow_notes: str = ""
     
-    # Чат
+    # Розмова цього браузера (випадковий id, створюється при першому зверненні)
+    chat_conversation_id: str = rx.Cookie("", name=CHAT_CONVERSATION_COOKIE, max_age=CHAT_CONVERSATION_MAX_AGE)
+    
+    # Чат: вікно з не більше ніж CHAT_HISTORY_LIMIT повідомлень
     chat_messages: List[Dict] = []
+    chat_has_older: bool = False
+    chat_at_latest: bool = True
     chat_input: str = ""
     chat_loading: bool = False
     show_chat: bool = False
@@ -66,61 +186,266 @@ class FarmState(rx.State):
     message: str = ""
     message_type: str = ""  # success, error, info
     
+    async def _fetch_page(self, page: str):
+        """Дані сторінки з API"""
+        path = PAGE_DATA[page][0]
+        params = None
+        if page == "table":
+            params = self._table_params()
+        elif page == "memory":
+            params = self._memory_params(self.memory_before)
+        response = await api_client.get(path, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+        return response.json()
+    
+    async def _load_pages(self, pages: List[str], force: bool = False):
+        """
+        Паралельне завантаження даних кількох сторінок (asyncio.gather)
+        Без force свіжі дані (молодші за DATA_FRESH_SECONDS) не перезавантажуються
+
+        Генератор: після ввімкнення спінерів робить yield, щоб обробник
+        події надіслав їх клієнту до запитів
+        (використання: async for _ in self._load_pages(...): yield)
+        """
+        now = time.time()
+        pages = [
+            page for page in dict.fromkeys(pages)
+            if page in PAGE_DATA and (force or now - self.loaded_at.get(page, 0) > DATA_FRESH_SECONDS)
+        ]
+        if not pages:
+            return
+        
+        # Спінер лише для сторінок без даних - інакше показуються попередні дані
+        spinners = [page for page in pages if page not in self.loaded_at]
+        for page in spinners:
+            setattr(self, PAGE_DATA[page][2], True)
+        if spinners:
+            yield
+        
+        results = await asyncio.gather(*(self._fetch_page(page) for page in pages), return_exceptions=True)
+        
+        loaded_at = dict(self.loaded_at)
+        for page, result in zip(pages, results):
+            _, data_var, loading_var, error_text = PAGE_DATA[page]
+            setattr(self, loading_var, False)
+            if isinstance(result, Exception):
+                self.show_message(f"{error_text}: {str(result)}", "error")
+                continue
+            if page == "table":
+                self._set_table_page(result)
+            elif page == "memory":
+                self._set_memory_page(result)
+            else:
+                setattr(self, data_var, result)
+            loaded_at[page] = time.time()
+        self.loaded_at = loaded_at
+    
+    async def load_page_data(self):
+        """Дані поточної сторінки та ймовірних наступних - одночасно"""
+        async for _ in self._load_pages([self.current_page, *PREFETCH_PAGES.get(self.current_page, [])]):
+            yield
+    
     async def load_weekly_records(self):
         """Завантаження тижневих записів"""
-        self.loading_weekly = True
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{API_URL}/weekly-records")
-                if response.status_code == 200:
-                    self.weekly_records = response.json()
-        except Exception as e:
-            self.show_message(f"Помилка завантаження: {str(e)}", "error")
-        finally:
-            self.loading_weekly = False
+        async for _ in self._load_pages(["weekly"], force=True):
+            yield
     
     async def load_sows(self):
         """Завантаження свиноматок"""
-        self.loading_sows = True
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{API_URL}/sows")
-                if response.status_code == 200:
-                    self.sows = response.json()
-        except Exception as e:
-            self.show_message(f"Помилка завантаження: {str(e)}", "error")
-        finally:
-            self.loading_sows = False
+        async for _ in self._load_pages(["sows"], force=True):
+            yield
     
     async def load_table(self):
-        """Завантажити таблицю Excel"""
-        self.loading_table = True
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{API_URL}/table")
-                if response.status_code == 200:
-                    self.table_data = response.json()
-                else:
-                    self.show_message(f"Помилка: {response.text}", "error")
-        except Exception as e:
-            self.show_message(f"Помилка таблиці: {str(e)}", "error")
-        finally:
-            self.loading_table = False
+        """Завантажити таблицю Excel (поточну сторінку)"""
+        async for _ in self._load_pages(["table"], force=True):
+            yield
+    
+    def _table_params(self) -> dict:
+        """Параметри запиту сторінки таблиці"""
+        params = {"source": self.table_source, "offset": self.table_offset, "limit": TABLE_PAGE_SIZE}
+        if self.table_sheet:
+            params["sheet"] = self.table_sheet
+        if self.table_sort:
+            params["sort"] = ",".join(self.table_sort)
+        if self.table_filters:
+            params["filter"] = self.table_filters
+        if self.table_search:
+            params["search"] = self.table_search
+        return params
+    
+    def _set_table_page(self, data: dict):
+        """Збереження сторінки таблиці: колонки та відформатовані клітинки"""
+        marks = {name.lstrip("-"): "↓" if name.startswith("-") else "↑" for name in self.table_sort}
+        columns = [
+            {**column, "mark": marks.get(column["name"], "")}
+            for column in data.get("columns", [])
+        ]
+        self.table_sheet = data.get("sheet", "")
+        self.table_sheets = data.get("sheets", [])
+        self.table_columns = columns
+        self.table_total = data.get("total", 0)
+        self.table_offset = data.get("offset", 0)
+        self.table_rows = [
+            [
+                {"text": format_cell(value, column["type"]), "align": TYPE_ALIGN.get(column["type"], "left")}
+                for value, column in zip(row, columns)
+            ]
+            for row in data.get("rows", [])
+        ]
+    
+    async def table_next_page(self):
+        """Наступна сторінка таблиці"""
+        if self.table_offset + TABLE_PAGE_SIZE < self.table_total:
+            self.table_offset += TABLE_PAGE_SIZE
+            async for _ in self._load_pages(["table"], force=True):
+                yield
+    
+    async def table_prev_page(self):
+        """Попередня сторінка таблиці"""
+        if self.table_offset > 0:
+            self.table_offset = max(0, self.table_offset - TABLE_PAGE_SIZE)
+            async for _ in self._load_pages(["table"], force=True):
+                yield
+    
+    def _reset_table_query(self):
+        """Скинути сортування, фільтри та пошук (колонки іншого аркуша)"""
+        self.table_sort = []
+        self.table_filters = []
+        self.table_search = ""
+        self.table_filter_column = ""
+    
+    async def select_table_source(self, source: str):
+        """Вибір файлу Excel (farm - тижневий облік, sows - облік свиноматок)"""
+        self.table_source = source
+        self.table_sheet = ""
+        self.table_offset = 0
+        self._reset_table_query()
+        async for _ in self._load_pages(["table"], force=True):
+            yield
+    
+    async def select_table_sheet(self, sheet: str):
+        """Вибір аркуша"""
+        self.table_sheet = sheet
+        self.table_offset = 0
+        self._reset_table_query()
+        async for _ in self._load_pages(["table"], force=True):
+            yield
+    
+    async def sort_table_by(self, column: str):
+        """Сортування за колонкою: за зростанням -> за спаданням -> без (кілька колонок - по черзі)"""
+        sort = list(self.table_sort)
+        if column in sort:
+            sort[sort.index(column)] = f"-{column}"
+        elif f"-{column}" in sort:
+            sort.remove(f"-{column}")
+        else:
+            sort.append(column)
+        self.table_sort = sort
+        self.table_offset = 0
+        async for _ in self._load_pages(["table"], force=True):
+            yield
+    
+    async def search_table(self, text: str):
+        """Пошук тексту в рядках таблиці"""
+        if text.strip() == self.table_search:
+            return
+        self.table_search = text.strip()
+        self.table_offset = 0
+        async for _ in self._load_pages(["table"], force=True):
+            yield
+    
+    async def add_table_filter(self):
+        """Додати фільтр колонка:оператор:значення"""
+        if not self.table_filter_column or not self.table_filter_value.strip():
+            return
+        self.table_filters = self.table_filters + [
+            f"{self.table_filter_column}:{self.table_filter_op}:{self.table_filter_value.strip()}"
+        ]
+        self.table_filter_value = ""
+        self.table_offset = 0
+        async for _ in self._load_pages(["table"], force=True):
+            yield
+    
+    async def remove_table_filter(self, item: str):
+        """Прибрати фільтр"""
+        self.table_filters = [existing for existing in self.table_filters if existing != item]
+        self.table_offset = 0
+        async for _ in self._load_pages(["table"], force=True):
+            yield
+    
+    @rx.var
+    def table_column_names(self) -> List[str]:
+        """Назви колонок для вибору фільтра"""
+        return [column["name"] for column in self.table_columns]
+    
+    @rx.var
+    def table_page_label(self) -> str:
+        """Підпис поточної сторінки таблиці"""
+        if not self.table_total:
+            return "Немає рядків"
+        last = min(self.table_offset + TABLE_PAGE_SIZE, self.table_total)
+        return f"Рядки {self.table_offset + 1}–{last} з {self.table_total}"
 
     async def load_memory(self):
-        """Завантажити пам'ять AI"""
-        self.loading_memory = True
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{API_URL}/memory")
-                if response.status_code == 200:
-                    self.memory = response.json()
-                else:
-                    self.show_message(f"Помилка: {response.text}", "error")
-        except Exception as e:
-            self.show_message(f"Помилка пам'яті: {str(e)}", "error")
-        finally:
-            self.loading_memory = False
+        """Завантажити пам'ять AI (останні повідомлення)"""
+        self.memory_before = 0
+        async for _ in self._load_pages(["memory"], force=True):
+            yield
+    
+    def _conversation_id(self) -> str:
+        """Розмова цього браузера - пам'ять чату не спільна для різних користувачів"""
+        if not self.chat_conversation_id:
+            self.chat_conversation_id = uuid.uuid4().hex
+        return self.chat_conversation_id
+    
+    def _memory_params(self, before: int = 0) -> dict:
+        """Параметри запиту сторінки розмови"""
+        params = {"conversation_id": self._conversation_id(), "limit": CHAT_HISTORY_LIMIT}
+        if before:
+            params["before"] = before
+        return params
+    
+    def _set_memory_page(self, messages: List[Dict]):
+        """Збереження сторінки пам'яті"""
+        self.memory = messages
+        self.memory_has_older = len(messages) == CHAT_HISTORY_LIMIT
+    
+    async def memory_older_page(self):
+        """Старіші повідомлення пам'яті"""
+        if self.memory and self.memory_has_older:
+            self.memory_before = self.memory[0]["id"]
+            async for _ in self._load_pages(["memory"], force=True):
+                yield
+    
+    async def _load_chat_window(self, before: int = 0):
+        """Вікно чату з сервера: останні повідомлення або старіші за before"""
+        response = await api_client.get("/memory", params=self._memory_params(before))
+        if response.status_code != 200:
+            self.show_message(f"Помилка історії чату: {response.text}", "error")
+            return
+        
+        messages = response.json()
+        self.chat_messages = [
+            {"id": m["id"], "role": m["role"], "content": m["text"], "timestamp": m["created_at"] or ""}
+            for m in messages
+        ]
+        self.chat_has_older = len(messages) == CHAT_HISTORY_LIMIT
+        self.chat_at_latest = not before
+    
+    async def chat_older_page(self):
+        """Старіші повідомлення чату (вікно зсувається назад)"""
+        if not self.chat_messages:
+            return
+        if not self.chat_messages[0].get("id"):
+            # Вікно з нових повідомлень без id - спершу отримати їх із сервера
+            await self._load_chat_window()
+        if self.chat_messages and self.chat_messages[0].get("id"):
+            await self._load_chat_window(self.chat_messages[0]["id"])
+    
+    async def chat_latest_page(self):
+        """Повернутися до останніх повідомлень чату"""
+        await self._load_chat_window()
 
     def open_excel_upload(self):
         self.show_excel_upload = True
@@ -131,15 +456,14 @@ class FarmState(rx.State):
         """Завантажити Excel файл на сервер"""
         self.excel_upload_loading = True
         try:
-            async with httpx.AsyncClient() as client:
-                files = {"file": (file.name, file, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
-                response = await client.post(f"{API_URL}/upload-excel", files=files)
-                if response.status_code == 200:
-                    self.show_message("Excel успішно завантажено!", "success")
-                    self.close_excel_upload()
-                    return FarmState.load_table
-                else:
-                    self.show_message(f"Помилка: {response.text}", "error")
+            files = {"file": (file.name, file, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+            response = await api_client.post("/upload-excel", files=files)
+            if response.status_code == 200:
+                self.show_message("Excel успішно завантажено!", "success")
+                self.close_excel_upload()
+                return FarmState.load_table
+            else:
+                self.show_message(f"Помилка: {response.text}", "error")
         except Exception as e:
             self.show_message(f"Помилка завантаження: {str(e)}", "error")
         finally:
@@ -149,14 +473,15 @@ class FarmState(rx.State):
         """Завантажити Excel звіт"""
         self.report_loading = True
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{API_URL}/report")
+            async with api_client.stream("GET", "/report") as response:
                 if response.status_code == 200:
-                    # Зберегти файл на пристрій
+                    # Зберегти файл на пристрій (частинами, без буферизації всього звіту)
                     with open("farm_report.xlsx", "wb") as f:
-                        f.write(response.content)
+                        async for chunk in response.aiter_bytes():
+                            f.write(chunk)
                     self.show_message("Звіт збережено!", "success")
                 else:
+                    await response.aread()
                     self.show_message(f"Помилка: {response.text}", "error")
         except Exception as e:
             self.show_message(f"Помилка звіту: {str(e)}", "error")
@@ -164,22 +489,15 @@ class FarmState(rx.State):
             self.report_loading = False
 
     def switch_page(self, page: str):
-        """Перемикання між сторінками"""
+        """Перемикання між сторінками (дані з кешу, застарілі - оновлюються)"""
         self.current_page = page
-        if page == "weekly":
-            return FarmState.load_weekly_records
-        elif page == "sows":
-            return FarmState.load_sows
-        elif page == "table":
-            return FarmState.load_table
-        elif page == "memory":
-            return FarmState.load_memory
-        elif page == "report":
-            return None
+        return FarmState.load_page_data
     
-    def toggle_chat(self):
-        """Показати/сховати чат"""
+    async def toggle_chat(self):
+        """Показати/сховати чат (при першому відкритті - історія з сервера)"""
         self.show_chat = not self.show_chat
+        if self.show_chat and not self.chat_messages:
+            await self._load_chat_window()
     
     def open_weekly_form(self, record_id: int = None):
         """Відкрити форму тижневого запису"""
@@ -210,54 +528,82 @@ class FarmState(rx.State):
         self.editing_id = None
     
     async def save_weekly_record(self):
-        """Зберегти тижневий запис"""
+        """Зберегти тижневий запис (одразу в списку, відкат при помилці)"""
+        data = {
+            "week_start_date": self.form_week_date,
+            "farrowings": self.form_farrowings,
+            "piglets_born_alive": self.form_alive,
+            "piglets_born_dead": self.form_dead,
+            "notes": self.form_notes
+        }
+        
+        editing_id = self.editing_id
+        record_id = editing_id or temp_id()
+        previous = next((r for r in self.weekly_records if r["id"] == record_id), None)
+        
+        # Оптимістичне оновлення списку до відповіді сервера
+        total_born = int(data["piglets_born_alive"] or 0) + int(data["piglets_born_dead"] or 0)
+        optimistic = {
+            **(previous or {}),
+            **data,
+            "id": record_id,
+            "survival_rate": round(int(data["piglets_born_alive"] or 0) / total_born * 100, 2) if total_born else 0.0,
+        }
+        self.weekly_records = upsert_item(self.weekly_records, optimistic, *LIST_ORDER["weekly"])
+        self.close_weekly_form()
+        yield
+        
         try:
-            data = {
-                "week_start_date": self.form_week_date,
-                "farrowings": self.form_farrowings,
-                "piglets_born_alive": self.form_alive,
-                "piglets_born_dead": self.form_dead,
-                "notes": self.form_notes
-            }
+            if editing_id:
+                # Оновлення
+                response = await api_client.put(
+                    f"/weekly-records/{editing_id}",
+                    json=data
+                )
+            else:
+                # Створення
+                response = await api_client.post(
+                    "/weekly-records",
+                    json=data
+                )
             
-            async with httpx.AsyncClient() as client:
-                if self.editing_id:
-                    # Оновлення
-                    response = await client.put(
-                        f"{API_URL}/weekly-records/{self.editing_id}",
-                        json=data
-                    )
-                else:
-                    # Створення
-                    response = await client.post(
-                        f"{API_URL}/weekly-records",
-                        json=data
-                    )
-                
-                if response.status_code in [200, 201]:
-                    self.show_message("Запис збережено успішно!", "success")
-                    self.close_weekly_form()
-                    return FarmState.load_weekly_records
-                else:
-                    self.show_message(f"Помилка: {response.text}", "error")
+            if response.status_code in [200, 201]:
+                # Запис з сервера замінює оптимістичний (новий отримує справжній id)
+                self.weekly_records = upsert_item(
+                    self.weekly_records, response.json(), *LIST_ORDER["weekly"], replace_id=record_id
+                )
+                self.show_message("Запис збережено успішно!", "success")
+                return
+            error = f"Помилка: {response.text}"
         
         except Exception as e:
-            self.show_message(f"Помилка збереження: {str(e)}", "error")
+            error = f"Помилка збереження: {str(e)}"
+        
+        # Відкат лише цього запису та повторне відкриття форми з введеними даними
+        self.weekly_records = restore_item(self.weekly_records, record_id, previous, *LIST_ORDER["weekly"])
+        self.editing_id = editing_id
+        self.show_weekly_form = True
+        self.show_message(error, "error")
     
     async def delete_weekly_record(self, record_id: int):
-        """Видалити тижневий запис"""
+        """Видалити тижневий запис (одразу зі списку, відкат при помилці)"""
+        previous = next((r for r in self.weekly_records if r["id"] == record_id), None)
+        self.weekly_records = [r for r in self.weekly_records if r["id"] != record_id]
+        yield
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(f"{API_URL}/weekly-records/{record_id}")
-                
-                if response.status_code == 200:
-                    self.show_message("Запис видалено!", "success")
-                    return FarmState.load_weekly_records
-                else:
-                    self.show_message(f"Помилка видалення: {response.text}", "error")
+            response = await api_client.delete(f"/weekly-records/{record_id}")
+            
+            if response.status_code == 200:
+                self.show_message("Запис видалено!", "success")
+                return
+            error = f"Помилка видалення: {response.text}"
         
         except Exception as e:
-            self.show_message(f"Помилка: {str(e)}", "error")
+            error = f"Помилка: {str(e)}"
+        
+        self.weekly_records = restore_item(self.weekly_records, record_id, previous, *LIST_ORDER["weekly"])
+        self.show_message(error, "error")
     
     def open_sow_form(self, sow_id: int = None):
         """Відкрити форму свиноматки"""
@@ -284,96 +630,144 @@ class FarmState(rx.State):
         self.editing_id = None
     
     async def save_sow(self):
-        """Зберегти свиноматку"""
+        """Зберегти свиноматку (одразу в списку, відкат при помилці)"""
+        data = {
+            "number": self.form_number,
+            "birth_date": self.form_birth_date,
+            "status": self.form_status,
+            "notes": self.form_sow_notes
+        }
+        
+        editing_id = self.editing_id
+        sow_id = editing_id or temp_id()
+        previous = next((s for s in self.sows if s["id"] == sow_id), None)
+        
+        # Оптимістичне оновлення списку до відповіді сервера
+        self.sows = upsert_item(self.sows, {**(previous or {}), **data, "id": sow_id}, *LIST_ORDER["sows"])
+        self.close_sow_form()
+        yield
+        
         try:
-            data = {
-                "number": self.form_number,
-                "birth_date": self.form_birth_date,
-                "status": self.form_status,
-                "notes": self.form_sow_notes
-            }
+            if editing_id:
+                response = await api_client.put(
+                    f"/sows/{editing_id}",
+                    json=data
+                )
+            else:
+                response = await api_client.post(
+                    "/sows",
+                    json=data
+                )
             
-            async with httpx.AsyncClient() as client:
-                if self.editing_id:
-                    response = await client.put(
-                        f"{API_URL}/sows/{self.editing_id}",
-                        json=data
-                    )
-                else:
-                    response = await client.post(
-                        f"{API_URL}/sows",
-                        json=data
-                    )
-                
-                if response.status_code in [200, 201]:
-                    self.show_message("Свиноматку збережено!", "success")
-                    self.close_sow_form()
-                    return FarmState.load_sows
-                else:
-                    self.show_message(f"Помилка: {response.text}", "error")
+            if response.status_code in [200, 201]:
+                self.sows = upsert_item(self.sows, response.json(), *LIST_ORDER["sows"], replace_id=sow_id)
+                self.show_message("Свиноматку збережено!", "success")
+                return
+            error = f"Помилка: {response.text}"
         
         except Exception as e:
-            self.show_message(f"Помилка збереження: {str(e)}", "error")
+            error = f"Помилка збереження: {str(e)}"
+        
+        # Відкат лише цієї свиноматки та повторне відкриття форми з введеними даними
+        self.sows = restore_item(self.sows, sow_id, previous, *LIST_ORDER["sows"])
+        self.editing_id = editing_id
+        self.show_sow_form = True
+        self.show_message(error, "error")
     
     async def delete_sow(self, sow_id: int):
-        """Видалити свиноматку"""
+        """Видалити свиноматку (одразу зі списку, відкат при помилці)"""
+        previous = next((s for s in self.sows if s["id"] == sow_id), None)
+        self.sows = [s for s in self.sows if s["id"] != sow_id]
+        yield
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(f"{API_URL}/sows/{sow_id}")
-                
-                if response.status_code == 200:
-                    self.show_message("Свиноматку видалено!", "success")
-                    return FarmState.load_sows
-                else:
-                    self.show_message(f"Помилка видалення: {response.text}", "error")
+            response = await api_client.delete(f"/sows/{sow_id}")
+            
+            if response.status_code == 200:
+                self.show_message("Свиноматку видалено!", "success")
+                return
+            error = f"Помилка видалення: {response.text}"
         
         except Exception as e:
-            self.show_message(f"Помилка: {str(e)}", "error")
+            error = f"Помилка: {str(e)}"
+        
+        self.sows = restore_item(self.sows, sow_id, previous, *LIST_ORDER["sows"])
+        self.show_message(error, "error")
     
     async def send_chat_message(self):
-        """Відправити повідомлення в чат"""
+        """Відправити повідомлення в чат (відповідь з'являється по мірі надходження)"""
         if not self.chat_input.strip():
             return
         
         user_message = self.chat_input
+        if not self.chat_at_latest:
+            await self._load_chat_window()
+        
         self.chat_messages.append({
             "role": "user",
             "content": user_message,
             "timestamp": datetime.now().isoformat()
         })
+        # Повідомлення асистента, що доповнюється фрагментами відповіді
+        self.chat_messages.append({
+            "role": "assistant",
+            "content": "",
+            "timestamp": datetime.now().isoformat()
+        })
+        if len(self.chat_messages) > CHAT_HISTORY_LIMIT:
+            # Найстаріші лишаються лише на сервері
+            self.chat_messages = self.chat_messages[-CHAT_HISTORY_LIMIT:]
+            self.chat_has_older = True
+        answer_index = len(self.chat_messages) - 1
         self.chat_input = ""
         self.chat_loading = True
+        yield
+        
+        parts = []
+        timestamp = None
+        error = ""
+        pushed_at = time.monotonic()
+        
+        def set_answer():
+            self.chat_messages[answer_index] = {
+                "role": "assistant",
+                "content": "".join(parts) + error,
+                "timestamp": timestamp or self.chat_messages[answer_index]["timestamp"]
+            }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{API_URL}/chat",
-                    json={"message": user_message, "include_context": True}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    self.chat_messages.append({
-                        "role": "assistant",
-                        "content": data["response"],
-                        "timestamp": data["timestamp"]
-                    })
+            async with api_client.stream(
+                "POST",
+                "/chat/stream",
+                json={"message": user_message, "include_context": True, "conversation_id": self._conversation_id()}
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    error = f"Помилка: {response.text}"
                 else:
-                    self.chat_messages.append({
-                        "role": "assistant",
-                        "content": f"Помилка: {response.text}",
-                        "timestamp": datetime.now().isoformat()
-                    })
+                    async for event, data in sse_events(response):
+                        if event == "token":
+                            parts.append(data["text"])
+                            # Оновлення стану не частіше ніж раз на CHAT_STREAM_YIELD_INTERVAL
+                            if time.monotonic() - pushed_at >= CHAT_STREAM_YIELD_INTERVAL:
+                                set_answer()
+                                pushed_at = time.monotonic()
+                                yield
+                        elif event == "done":
+                            timestamp = data.get("timestamp")
+                        elif event == "error":
+                            error = f"Помилка: {data.get('detail')}"
         
         except Exception as e:
-            self.chat_messages.append({
-                "role": "assistant",
-                "content": f"Помилка зв'язку: {str(e)}",
-                "timestamp": datetime.now().isoformat()
-            })
+            error = f"Помилка зв'язку: {str(e)}"
         
         finally:
+            if parts and error:
+                error = "\n\n" + error
+            set_answer()
             self.chat_loading = False
+            # Сторінка пам'яті застаріла - перезавантажиться при наступному відкритті
+            self.loaded_at = {page: at for page, at in self.loaded_at.items() if page != "memory"}
     
     def show_message(self, text: str, msg_type: str):
         """Показати повідомлення"""
@@ -560,28 +954,119 @@ def sows_page() -> rx.Component:
 
 
 def table_page() -> rx.Component:
-    """Сторінка перегляду таблиці Excel"""
+    """Сторінка перегляду таблиці Excel (посторінково з сервера)"""
     return rx.vstack(
         rx.heading("📋 Таблиця Excel", size="6"),
-        rx.button(
-            "Завантажити Excel",
-            on_click=lambda: FarmState.open_excel_upload(),
-            size="3",
+        rx.hstack(
+            rx.button(
+                "Завантажити Excel",
+                on_click=lambda: FarmState.open_excel_upload(),
+                size="3",
+            ),
+            rx.select.root(
+                rx.select.trigger(),
+                rx.select.content(
+                    rx.select.item("Тижневий облік", value="farm"),
+                    rx.select.item("Облік свиноматок", value="sows"),
+                ),
+                value=FarmState.table_source,
+                on_change=FarmState.select_table_source,
+            ),
+            rx.select(
+                FarmState.table_sheets,
+                value=FarmState.table_sheet,
+                on_change=FarmState.select_table_sheet,
+            ),
+            spacing="3",
+            align="center",
+        ),
+        rx.hstack(
+            rx.input(
+                placeholder="Пошук у таблиці...",
+                default_value=FarmState.table_search,
+                on_blur=FarmState.search_table,
+                size="2",
+            ),
+            rx.select(
+                FarmState.table_column_names,
+                placeholder="Колонка",
+                value=FarmState.table_filter_column,
+                on_change=FarmState.set_table_filter_column,
+            ),
+            rx.select.root(
+                rx.select.trigger(),
+                rx.select.content(
+                    *[rx.select.item(label, value=op) for op, label in TABLE_FILTER_LABELS.items()],
+                ),
+                value=FarmState.table_filter_op,
+                on_change=FarmState.set_table_filter_op,
+            ),
+            rx.input(
+                placeholder="Значення",
+                value=FarmState.table_filter_value,
+                on_change=FarmState.set_table_filter_value,
+                size="2",
+            ),
+            rx.button("Фільтр", on_click=FarmState.add_table_filter, size="2", variant="soft"),
+            spacing="2",
+            align="center",
+            wrap="wrap",
+        ),
+        rx.hstack(
+            rx.foreach(
+                FarmState.table_filters,
+                lambda item: rx.badge(
+                    item,
+                    " ✕",
+                    on_click=FarmState.remove_table_filter(item),
+                    cursor="pointer",
+                ),
+            ),
+            spacing="2",
+            wrap="wrap",
         ),
         rx.cond(
             FarmState.loading_table,
             rx.spinner(size="3"),
-            rx.box(
-                rx.foreach(
-                    FarmState.table_data,
-                    lambda row: rx.card(
-                        rx.text(str(row)),
-                        width="100%",
+            rx.table.root(
+                rx.table.header(
+                    rx.table.row(
+                        rx.foreach(
+                            FarmState.table_columns,
+                            lambda column: rx.table.column_header_cell(
+                                column["name"],
+                                " ",
+                                column["mark"],
+                                on_click=FarmState.sort_table_by(column["name"]),
+                                cursor="pointer",
+                                text_align=rx.cond(column["type"] == "number", "right", "left"),
+                            ),
+                        ),
                     ),
                 ),
+                rx.table.body(
+                    rx.foreach(
+                        FarmState.table_rows,
+                        lambda row: rx.table.row(
+                            rx.foreach(
+                                row,
+                                lambda cell: rx.table.cell(cell["text"], text_align=cell["align"]),
+                            ),
+                        ),
+                    ),
+                ),
+                variant="surface",
+                size="1",
                 width="100%",
             ),
         ),
+        rx.hstack(
+            rx.button("←", on_click=FarmState.table_prev_page, size="2", variant="soft"),
+            rx.text(FarmState.table_page_label, size="2"),
+            rx.button("→", on_click=FarmState.table_next_page, size="2", variant="soft"),
+            spacing="3",
+            align="center",
+        ),
         width="100%",
         padding="1em",
     )
@@ -591,6 +1076,22 @@ def memory_page() -> rx.Component:
     """Сторінка пам'яті AI"""
     return rx.vstack(
         rx.heading("🧠 Пам'ять AI", size="6"),
+        rx.hstack(
+            rx.button(
+                "Старіші",
+                on_click=FarmState.memory_older_page,
+                disabled=~FarmState.memory_has_older,
+                size="2",
+                variant="outline",
+            ),
+            rx.button(
+                "Останні",
+                on_click=FarmState.load_memory,
+                disabled=FarmState.memory_before == 0,
+                size="2",
+                variant="outline",
+            ),
+        ),
         rx.box(
             rx.foreach(
                 FarmState.memory,
@@ -640,11 +1141,23 @@ def chat_panel() -> rx.Component:
                     background_color="var(--accent-3)",
                 ),
                 rx.box(
+                    rx.hstack(
+                        rx.cond(
+                            FarmState.chat_has_older,
+                            rx.button("Старіші повідомлення", on_click=FarmState.chat_older_page, size="1", variant="ghost"),
+                        ),
+                        rx.spacer(),
+                        rx.cond(
+                            ~FarmState.chat_at_latest,
+                            rx.button("До останніх", on_click=FarmState.chat_latest_page, size="1", variant="ghost"),
+                        ),
+                        width="100%",
+                    ),
                     rx.foreach(
                         FarmState.chat_messages,
                         lambda msg: rx.box(
                             rx.card(
-                                rx.text(msg["content"], size="2"),
+                                rx.text(rx.cond(msg["content"] == "", "…", msg["content"]), size="2"),
                                 background_color=rx.cond(
                                     msg["role"] == "user",
                                     "var(--accent-3)",
@@ -744,4 +1257,5 @@ def index() -> rx.Component:
 
 # Створення додатку
 app = rx.App()
-app.add_page(index, on_load=FarmState.load_weekly_records)
+app.register_lifespan_task(api_client.lifespan)
+app.add_page(index, on_load=FarmState.load_page_data)
@@ -0,0 +1,311 @@
+"""
+Вбудований (in-process) транспорт frontend
+
+Якщо frontend і backend працюють на одному сервері (API_TRANSPORT=local),
+запити FarmState не йдуть через мережу: функції routes викликаються напряму
+з локальною сесією бази даних, без HTTP та JSON серіалізації. Потокові
+відповіді (StreamingResponse) читаються в процесі. Шляхи, яких немає в
+таблицях маршрутів, і далі надсилаються по HTTP.
+
+Обробники з синхронною роботою БД та pandas виконуються в окремому потоці,
+щоб не блокувати цикл подій Reflex. База даних і файли Excel за
+замовчуванням - у farm_render_deploy/ (як при запуску backend за Procfile),
+незалежно від робочого каталогу процесу Reflex.
+
+Потребує залежностей backend (backend_requirements.txt) в середовищі frontend.
+"""
+
+import asyncio
+import contextlib
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+# Ферма, з базою якої працює вбудований транспорт
+LOCAL_FARM_ID = os.getenv("LOCAL_FARM_ID", "")
+
+# Каталог backend проекту (database/, backend/)
+BACKEND_ROOT = str(Path(__file__).resolve().parent.parent / "farm_render_deploy")
+
+# Відносні шляхи backend ("./farm.db", Excel у ".") рахуються від каталогу backend
+# проекту (робочий каталог Procfile), а не від робочого каталогу процесу Reflex
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(BACKEND_ROOT) / 'farm.db'}")
+os.environ.setdefault("FARM_DB_DIR", str(Path(BACKEND_ROOT) / "farms"))
+os.environ.setdefault("EXCEL_DIR", BACKEND_ROOT)
+
+
+class LocalResponse:
+    """Відповідь вбудованого транспорту з інтерфейсом httpx.Response"""
+
+    def __init__(self, status_code: int, data: Any):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self) -> Any:
+        return self.data
+
+    @property
+    def text(self) -> str:
+        import json
+        return json.dumps(self.data, ensure_ascii=False)
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode("utf-8")
+
+    async def aread(self) -> bytes:
+        return self.content
+
+
+class LocalStreamResponse:
+    """Потокова відповідь вбудованого транспорту з інтерфейсом потокової httpx.Response"""
+
+    def __init__(self, status_code: int, body: AsyncIterator):
+        self.status_code = status_code
+        self.body = body
+        self.content = b""
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    async def aiter_bytes(self) -> AsyncIterator[bytes]:
+        async for chunk in self.body:
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+    async def aiter_lines(self) -> AsyncIterator[str]:
+        buffer = ""
+        async for chunk in self.aiter_bytes():
+            buffer += chunk.decode("utf-8")
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                yield line.rstrip("\r")
+        if buffer:
+            yield buffer
+
+    async def aread(self) -> bytes:
+        self.content = b"".join([chunk async for chunk in self.aiter_bytes()])
+        return self.content
+
+
+class Sessions:
+    """Сесії запиту (для читання та запису), що створюються при потребі"""
+
+    def __init__(self, farm_id: str):
+        self.farm_id = farm_id
+        self._opened = {}
+
+    def get(self, read_only: bool = False):
+        if read_only not in self._opened:
+            from database.models import engine_registry
+            self._opened[read_only] = engine_registry.get_sessionmaker(self.farm_id, read_only=read_only)()
+        return self._opened[read_only]
+
+    @property
+    def read(self):
+        return self.get(read_only=True)
+
+    @property
+    def write(self):
+        return self.get()
+
+    def close(self):
+        for session in self._opened.values():
+            session.close()
+        self._opened.clear()
+
+
+def _int_param(params: dict, name: str, default: Optional[int], low: int, high: Optional[int] = None) -> Optional[int]:
+    """Цілий query параметр з тими ж межами, що й у main.py"""
+    value = params.get(name)
+    if value is None or value == "":
+        return default
+    value = int(value)
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"{name}: {value} поза межами")
+    return value
+
+
+def _list_param(params: dict, name: str) -> List[str]:
+    """Повторюваний query параметр (рядок або список)"""
+    value = params.get(name) or []
+    return [value] if isinstance(value, str) else list(value)
+
+
+# Таблиця маршрутів: (метод, шаблон шляху, обробник(routes, sessions, match, params, body))
+Handler = Callable[..., Any]
+
+
+def on_event_loop(handler: Handler) -> Handler:
+    """
+    Обробник, що виконується в циклі подій Reflex, а не в окремому потоці
+    (виклики AI: черга та single-flight прив'язані до циклу подій)
+    """
+    handler.on_event_loop = True
+    return handler
+
+ROUTES: List[Tuple[str, re.Pattern, Handler]] = [
+    ("GET", re.compile(r"^/weekly-records$"),
+     lambda r, s, m, p, b: r.get_weekly_records(s.read)),
+    ("POST", re.compile(r"^/weekly-records$"),
+     lambda r, s, m, p, b: r.create_weekly_record(r.WeeklyRecordCreate(**b), s.write)),
+    ("PUT", re.compile(r"^/weekly-records/(\d+)$"),
+     lambda r, s, m, p, b: r.update_weekly_record(int(m[1]), r.WeeklyRecordUpdate(**b), s.write)),
+    ("DELETE", re.compile(r"^/weekly-records/(\d+)$"),
+     lambda r, s, m, p, b: r.delete_weekly_record(int(m[1]), s.write)),
+    ("GET", re.compile(r"^/sows$"),
+     lambda r, s, m, p, b: r.get_sows(s.read)),
+    ("POST", re.compile(r"^/sows$"),
+     lambda r, s, m, p, b: r.create_sow(r.SowCreate(**b), s.write)),
+    ("PUT", re.compile(r"^/sows/(\d+)$"),
+     lambda r, s, m, p, b: r.update_sow(int(m[1]), r.SowUpdate(**b), s.write)),
+    ("DELETE", re.compile(r"^/sows/(\d+)$"),
+     lambda r, s, m, p, b: r.delete_sow(int(m[1]), s.write)),
+    ("GET", re.compile(r"^/table$"),
+     lambda r, s, m, p, b: r.get_table_page(
+         p.get("source", "farm"),
+         p.get("sheet") or None,
+         _int_param(p, "offset", 0, 0),
+         _int_param(p, "limit", 50, 1, 500),
+         p.get("sort"),
+         _list_param(p, "filter"),
+         p.get("search"),
+         p.get("cursor"),
+     )),
+    ("GET", re.compile(r"^/memory$"),
+     lambda r, s, m, p, b: r.get_memory(
+         p.get("conversation_id", "default"),
+         _int_param(p, "before", None, 1),
+         _int_param(p, "limit", 50, 1, 200),
+         s.read,
+     )),
+    ("POST", re.compile(r"^/chat$"),
+     on_event_loop(lambda r, s, m, p, b: r.chat_with_ai(r.ChatRequest(**b), s.read, s.write))),
+]
+
+# Потокові маршрути: обробник(routes, sessions, match, params, body, is_disconnected) -> StreamingResponse
+STREAM_ROUTES: List[Tuple[str, re.Pattern, Handler]] = [
+    ("POST", re.compile(r"^/chat/stream$"),
+     lambda r, s, m, p, b, d: r.stream_chat_with_ai(r.ChatRequest(**b), s.read, d, s.write)),
+]
+
+
+def _error_response(error: Exception) -> Optional[LocalResponse]:
+    """Відповідь на помилку як у FastAPI (None - помилка не очікувана)"""
+    from fastapi import HTTPException
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import ValidationError
+
+    if isinstance(error, HTTPException):
+        return LocalResponse(error.status_code, {"detail": error.detail})
+    if isinstance(error, ValidationError):
+        return LocalResponse(422, {"detail": jsonable_encoder(error.errors())})
+    if isinstance(error, ValueError):
+        return LocalResponse(422, {"detail": str(error)})
+    if type(error) is LookupError:  # Ферму LOCAL_FARM_ID не створено
+        return LocalResponse(404, {"detail": str(error)})
+    return None
+
+
+def _run_in_thread(handler: Handler, *args) -> Any:
+    """Обробник у власному циклі подій (викликається в окремому потоці)"""
+    return asyncio.run(handler(*args))
+
+
+class LocalTransport:
+    """Виклик функцій routes напряму (без HTTP)"""
+
+    def __init__(self, farm_id: str = LOCAL_FARM_ID):
+        self.farm_id = farm_id
+        self._routes = None
+
+    def match(self, method: str, path: str, stream: bool = False):
+        """Обробник та збіг шляху, або (None, None) - шлях іде по HTTP"""
+        for route_method, pattern, handler in (STREAM_ROUTES if stream else ROUTES):
+            if route_method == method:
+                found = pattern.match(path)
+                if found:
+                    return handler, found
+        return None, None
+
+    def _import_backend(self):
+        """Імпорт модуля routes та ферми за замовчуванням"""
+        if BACKEND_ROOT not in sys.path:
+            sys.path.append(BACKEND_ROOT)
+        from database.models import DEFAULT_FARM_ID
+        from backend import routes
+
+        self.farm_id = self.farm_id or DEFAULT_FARM_ID
+        self._routes = routes
+        return routes
+
+    @property
+    def routes(self):
+        """Модуль routes (імпортується при старті або першому запиті)"""
+        return self._routes or self._import_backend()
+
+    async def startup(self):
+        """Старт додатку: імпорт backend та створення таблиць (у потоці, до першого запиту)"""
+        def prepare():
+            self._import_backend()
+            from database.models import create_tables
+            create_tables()
+
+        await asyncio.to_thread(prepare)
+
+    async def request(self, handler: Handler, found: re.Match, params: Optional[dict] = None, json: Any = None) -> LocalResponse:
+        """Виконати обробник; помилки перетворюються на відповіді як у FastAPI"""
+        from fastapi.encoders import jsonable_encoder
+
+        routes = self.routes
+        sessions = Sessions(self.farm_id)
+        args = (routes, sessions, found, params or {}, json or {})
+        try:
+            if getattr(handler, "on_event_loop", False):
+                result = await handler(*args)
+            else:
+                result = await asyncio.to_thread(_run_in_thread, handler, *args)
+            return LocalResponse(200, jsonable_encoder(result))
+        except Exception as e:
+            response = _error_response(e)
+            if response is None:
+                raise
+            return response
+        finally:
+            sessions.close()
+
+    @contextlib.asynccontextmanager
+    async def stream(self, handler: Handler, found: re.Match, params: Optional[dict] = None, json: Any = None):
+        """
+        Потоковий обробник: тіло StreamingResponse читається частинами в процесі
+
+        Сесії лишаються відкритими до кінця потоку. Вихід з контексту до кінця
+        відповіді - це відключення клієнта: генератор тіла закривається.
+        """
+        routes = self.routes
+        sessions = Sessions(self.farm_id)
+        closed = False
+
+        async def is_disconnected() -> bool:
+            return closed
+
+        try:
+            try:
+                result = await handler(routes, sessions, found, params or {}, json or {}, is_disconnected)
+            except Exception as e:
+                response = _error_response(e)
+                if response is None:
+                    raise
+                yield response
+                return
+
+            body = result.body_iterator
+            try:
+                yield LocalStreamResponse(result.status_code, body)
+            finally:
+                closed = True
+                await body.aclose()
+        finally:
+            sessions.close()